@@ -0,0 +1,392 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+import sparse_support
+from profiling import profiled
+
+DEFAULT_WORKBOOK = "IFB398 24se1 Project Allocation.xlsx"
+DEFAULT_SHEETS = ("impact", "fit", "pref")
+# Layout of the generated Prototype System/tests/Sample*.xlsx fixtures
+SAMPLE_SHEETS = (None, "Fit", "Preference")
+SAMPLE_LAYOUT = dict(sheets=SAMPLE_SHEETS, header_rows=0, label_columns=1)
+CACHE_DIR = ".allocation_cache"
+CACHE_VERSION = 1
+FLOAT_DTYPES = (np.float32, np.float64)
+# What a blank cell becomes: "nan" keeps it missing, "zero" reads it as 0 and
+# "error" reports it like any other bad cell
+BLANK_POLICIES = ("nan", "zero", "error")
+# Rows converted at a time by sparse loads
+SPARSE_CHUNK_ROWS = 1024
+
+
+class MatrixValueError(ValueError):
+    """A workbook sheet has cells that are not numbers.
+
+    ``cells`` lists every offending cell as ``(sheet, cell, team, project,
+    value)`` with ``cell`` in spreadsheet notation, e.g. ``"C5"``.
+    """
+
+    def __init__(self, cells, limit=10):
+        self.cells = cells
+        shown = "\n".join(f"  {sheet}!{cell} (team {team!r}, project {project!r}): {value!r}"
+                          for sheet, cell, team, project, value in cells[:limit])
+        more = f"\n  ... and {len(cells) - limit} more" if len(cells) > limit else ""
+        super().__init__(f"{len(cells)} cell(s) are not numbers:\n{shown}{more}")
+
+
+class AllocationData(object):
+    """The three allocation matrices of a cohort plus their shared axes.
+
+    ``impact``, ``capability`` and ``preference`` are teams x projects arrays
+    in the same row/column order as ``team_names`` and ``project_names``.
+
+    A sparse cohort (``to_sparse``, ``load_allocation_data(sparse=True)``)
+    holds three SciPy CSR matrices instead: the non-zero impact entries and
+    the fit and preference values at those same entries. They share one set
+    of index arrays, so memory grows with the number of viable team-project
+    pairs. Fit and preference elsewhere are dropped, they never reach a
+    b value because the impact there is 0.
+    """
+
+    def __init__(self, impact, capability, preference, team_names, project_names):
+        self.impact = impact
+        self.capability = capability
+        self.preference = preference
+        self.team_names = team_names
+        self.project_names = project_names
+
+    @property
+    def shape(self):
+        return self.impact.shape
+
+    def arrays(self):
+        return (self.impact, self.capability, self.preference)
+
+    @property
+    def is_sparse(self):
+        return sparse_support.issparse(self.impact)
+
+    def to_sparse(self):
+        # Same cohort on the CSR support of the impact matrix, b values are
+        # then only computed where the impact is non-zero
+        if self.is_sparse:
+            return self
+        impact = sparse_support.as_csr(self.impact)
+        capability, preference = (sparse_support.on_structure(impact, sparse_support.gather(matrix, impact))
+                                  for matrix in (self.capability, self.preference))
+        return AllocationData(impact, capability, preference, self.team_names, self.project_names)
+
+    def to_dense(self):
+        # Dense arrays again, fit and preference are 0 off the impact support
+        if not self.is_sparse:
+            return self
+        return AllocationData(*(matrix.toarray() for matrix in self.arrays()),
+                              team_names=self.team_names, project_names=self.project_names)
+
+    def __repr__(self):
+        return f"AllocationData(teams={self.shape[0]}, projects={self.shape[1]})"
+
+
+def float_dtype(dtype):
+    dtype = np.dtype(dtype)
+    if dtype.type not in FLOAT_DTYPES:
+        raise ValueError(f"Matrices must be float32 or float64, not {dtype}")
+    return dtype
+
+
+def column_letters(index):
+    # Zero-based column index to spreadsheet letters, 0 -> A, 26 -> AA
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def coerce_matrix(frame, dtype=np.float64, blanks="nan"):
+    """Converts a block of sheet cells into a contiguous float matrix.
+
+    Returns ``(matrix, bad)`` where ``bad`` is a boolean mask of the cells that
+    could not be read as finite numbers. Blank cells (missing or whitespace
+    only) become NaN or 0 according to ``blanks``, or are marked bad with
+    ``blanks="error"``. Numeric text such as ``"3"`` is accepted, TRUE/FALSE
+    cells are bad. That needs the raw cell values: ``pd.read_excel`` turns
+    booleans in an otherwise numeric column into 1/0 unless it is given
+    ``dtype=object``, as ``read_workbook`` does.
+    """
+    if blanks not in BLANK_POLICIES:
+        raise ValueError(f"blanks must be one of {BLANK_POLICIES}, not {blanks!r}")
+    dtype = float_dtype(dtype)
+    # Columns below a text header row arrive as objects even when every cell
+    # is a number
+    frame = pd.DataFrame(frame).infer_objects()
+    if all(pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column)
+           for column in frame.dtypes):
+        # Already numeric, the common case of a clean sheet
+        values = frame.to_numpy(dtype=np.float64, copy=True)
+        blank = np.isnan(values)
+    else:
+        text = frame.astype(object)
+        blank = (text.isna() | text.map(lambda cell: isinstance(cell, str) and not cell.strip())).to_numpy()
+        values = frame.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64, copy=True)
+        # Booleans would silently become 0/1
+        values[text.map(lambda cell: isinstance(cell, (bool, np.bool_))).to_numpy()] = np.nan
+
+    bad = ~blank & ~np.isfinite(values)
+    if blanks == "error":
+        bad |= blank
+    else:
+        values[blank] = np.nan if blanks == "nan" else 0.0
+    return np.ascontiguousarray(values, dtype=dtype), bad
+
+
+def as_float_matrix(matrix, dtype=np.float64):
+    # Contiguous float copy (or the array itself when it already is one)
+    return np.ascontiguousarray(matrix, dtype=float_dtype(dtype))
+
+
+def file_digest(filename, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(filename, sheets, header_rows, label_columns, cache_dir=None, dtype=np.float64,
+               blanks="nan", sparse=False):
+    # One cache file per workbook, layout and conversion, so different sheet
+    # selections of the same workbook never overwrite each other
+    directory = cache_dir or os.path.join(
+        os.path.dirname(os.path.abspath(filename)), CACHE_DIR)
+    layout = ("|".join(str(sheet) for sheet in sheets)
+              + f"|{header_rows}|{label_columns}|{np.dtype(dtype).str}|{blanks}"
+              + ("|sparse" if sparse else ""))
+    layout_key = hashlib.sha1(layout.encode("utf-8")).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(directory, f"{stem}.{layout_key}.npz")
+
+
+def read_workbook(filename, sheets=DEFAULT_SHEETS, header_rows=1, label_columns=2, dtype=np.float64,
+                  blanks="nan", sparse=False):
+    # Opens and parses the workbook once for all three sheets. Workbooks without
+    # an impact sheet (the Prototype System Sample files) pass None for it and
+    # get an impact of 1 for every pairing. Cells that are not numbers in any
+    # sheet are reported together in one MatrixValueError.
+    dtype = float_dtype(dtype)
+    present = [sheet for sheet in sheets if sheet is not None]
+    # Objects keep TRUE/FALSE cells as booleans for coerce_matrix to reject
+    frames = pd.read_excel(filename, sheet_name=present, dtype=object)
+    first = present[0]
+
+    team_names = frames[first].iloc[header_rows:, 0].to_numpy()
+    project_names = frames[first].columns[label_columns:].to_numpy()
+
+    blocks = []
+    for sheet in sheets:
+        if sheet is None:
+            blocks.append(None)
+            continue
+        frame = frames[sheet]
+        sheet_teams = frame.iloc[header_rows:, 0].to_numpy()
+        sheet_projects = frame.columns[label_columns:].to_numpy()
+        if len(sheet_teams) != len(team_names) or np.any(sheet_teams != team_names):
+            raise ValueError(
+                f"Sheet '{sheet}' does not have the same teams as sheet '{first}'")
+        if len(sheet_projects) != len(project_names) or np.any(sheet_projects != project_names):
+            raise ValueError(
+                f"Sheet '{sheet}' does not have the same projects as sheet '{first}'")
+        blocks.append(frame.iloc[header_rows:, label_columns:])
+
+    def cell_errors(sheet, cells, bad, first_row=0):
+        # The column headers are on the first sheet row
+        return [(sheet, f"{column_letters(label_columns + column)}{header_rows + first_row + row + 2}",
+                 str(team_names[first_row + row]), str(project_names[column]), cells.iat[row, column])
+                for row, column in zip(*np.nonzero(bad))]
+
+    shape = (len(team_names), len(project_names))
+    if sparse:
+        matrices, bad_cells = _read_sparse(sheets, blocks, shape, dtype, blanks, cell_errors)
+    else:
+        matrices, bad_cells = [], []
+        for sheet, cells in zip(sheets, blocks):
+            if cells is None:
+                matrices.append(np.ones(shape, dtype=dtype))
+                continue
+            matrix, bad = coerce_matrix(cells, dtype, blanks)
+            bad_cells += cell_errors(sheet, cells, bad)
+            matrices.append(matrix)
+    if bad_cells:
+        raise MatrixValueError(bad_cells)
+    return AllocationData(*matrices,
+                          team_names=team_names.astype(str),
+                          project_names=project_names.astype(str))
+
+
+def _read_sparse(sheets, blocks, shape, dtype, blanks, cell_errors, chunk_rows=SPARSE_CHUNK_ROWS):
+    # Converts the sheet cells ``chunk_rows`` rows at a time and keeps only
+    # the non-zero impact entries and the fit and preference values there, so
+    # no dense teams x projects float matrix is ever built. Returns the three
+    # CSR matrices (sharing their index arrays) and the bad cells.
+    team_count, project_count = shape
+    row_counts = np.zeros(team_count, dtype=np.int64)
+    columns, values, bad_cells = [], [[], [], []], [[], [], []]
+    for start in range(0, team_count, chunk_rows):
+        stop = min(start + chunk_rows, team_count)
+        chunk = []
+        for sheet, cells, sheet_errors in zip(sheets, blocks, bad_cells):
+            if cells is None:
+                chunk.append(np.ones((stop - start, project_count), dtype=dtype))
+                continue
+            matrix, bad = coerce_matrix(cells.iloc[start:stop], dtype, blanks)
+            sheet_errors += cell_errors(sheet, cells.iloc[start:stop], bad, start)
+            chunk.append(matrix)
+        # NaN impacts are kept, as by as_csr
+        rows, chunk_columns = np.nonzero(chunk[0] != 0)
+        row_counts[start:stop] = np.bincount(rows, minlength=stop - start)
+        columns.append(chunk_columns)
+        for stored, matrix in zip(values, chunk):
+            stored.append(matrix[rows, chunk_columns])
+
+    impact = sparse_support.from_parts(_joined(values[0], dtype), _joined(columns, np.intp),
+                                       np.concatenate(([0], np.cumsum(row_counts))), shape)
+    matrices = [impact] + [sparse_support.on_structure(impact, _joined(stored, dtype)) for stored in values[1:]]
+    return matrices, [cell for sheet_errors in bad_cells for cell in sheet_errors]
+
+
+def _joined(parts, dtype):
+    return np.concatenate(parts).astype(dtype, copy=False) if parts else np.empty(0, dtype=dtype)
+
+
+def _matrix_entries(data):
+    # npz entries of a cohort's matrices. A sparse cohort stores the impact's
+    # CSR structure once and the three matrices as its data vectors
+    if not data.is_sparse:
+        return dict(impact=data.impact, capability=data.capability, preference=data.preference)
+    impact = data.impact
+    return dict(impact=impact.data, capability=sparse_support.gather(data.capability, impact),
+                preference=sparse_support.gather(data.preference, impact), indices=impact.indices,
+                indptr=impact.indptr, shape=np.asarray(impact.shape, dtype=np.int64))
+
+
+def _stored_data(stored, dtype=None):
+    # AllocationData from the entries written by _matrix_entries
+    names = ("impact", "capability", "preference")
+    convert = (lambda matrix: matrix) if dtype is None else (lambda matrix: as_float_matrix(matrix, dtype))
+    if "indptr" in stored:
+        impact = sparse_support.from_parts(convert(stored["impact"]), stored["indices"], stored["indptr"],
+                                           tuple(int(size) for size in stored["shape"]))
+        matrices = [impact] + [sparse_support.on_structure(impact, convert(stored[name])) for name in names[1:]]
+    else:
+        matrices = [convert(stored[name]) for name in names]
+    return AllocationData(*matrices, team_names=stored["team_names"], project_names=stored["project_names"])
+
+
+def write_cache(path, data, digest, stat):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file first so an interrupted run never leaves a
+    # half written cache behind
+    temporary = path + ".tmp.npz"
+    np.savez(temporary,
+             version=np.int64(CACHE_VERSION),
+             digest=np.str_(digest),
+             mtime_ns=np.int64(stat.st_mtime_ns),
+             size=np.int64(stat.st_size),
+             team_names=data.team_names,
+             project_names=data.project_names,
+             **_matrix_entries(data))
+    os.replace(temporary, path)
+
+
+def read_cache(path, filename, stat):
+    # Returns the cached data if it still belongs to the workbook, else None
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as cached:
+            if int(cached["version"]) != CACHE_VERSION:
+                return None
+            data = _stored_data(cached)
+            if int(cached["mtime_ns"]) == stat.st_mtime_ns and int(cached["size"]) == stat.st_size:
+                return data
+            # The file was touched, only trust the cache if the content is unchanged
+            digest = str(cached["digest"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+    if digest != file_digest(filename):
+        return None
+    try:
+        write_cache(path, data, digest, stat)
+    except OSError:
+        pass
+    return data
+
+
+def save_allocation_npz(data, path):
+    # Plain binary copy of a cohort that load_allocation_data reads back directly,
+    # sparse cohorts stay sparse
+    np.savez(path, team_names=np.asarray(data.team_names).astype(str),
+             project_names=np.asarray(data.project_names).astype(str), **_matrix_entries(data))
+
+
+def read_npz(path, dtype=np.float64, sparse=False):
+    with np.load(path, allow_pickle=False) as stored:
+        data = _stored_data(stored, dtype)
+    return data.to_sparse() if sparse else data.to_dense()
+
+
+@profiled("load")
+def load_allocation_data(filename=DEFAULT_WORKBOOK, sheets=DEFAULT_SHEETS,
+                         header_rows=1, label_columns=2, use_cache=True, cache_dir=None, sparse=False,
+                         dtype=np.float64, blanks="nan"):
+    """Loads the impact, fit and preference matrices of an allocation workbook.
+
+    ``sheets`` names the impact, capability and preference sheets in that order,
+    an impact sheet of None means every pairing has an impact of 1.
+    ``header_rows`` data rows are skipped below the column headers and the first
+    ``label_columns`` columns are not projects, the defaults match the
+    "IFB398 24se1 Project Allocation.xlsx" layout.
+
+    The parsed matrices are cached in a ``.npz`` file next to the workbook, keyed
+    by the workbook's modification time and SHA-256 digest, so later runs skip
+    openpyxl entirely. ``.npz`` files written by ``save_allocation_npz`` are
+    loaded directly.
+
+    The matrices are contiguous ``dtype`` arrays, float64 or float32 (half
+    the memory). Blank cells become NaN by default, ``blanks="zero"`` reads
+    them as 0 and ``blanks="error"`` rejects them. Cells that are not numbers
+    raise a ``MatrixValueError`` listing each one with its sheet coordinates.
+
+    With ``sparse`` the cohort is returned on the CSR support of its non-zero
+    impact entries (see ``AllocationData``) and the whole b value pipeline
+    works on that support. Workbooks are then converted a block of rows at a
+    time and cached in the sparse form, so no dense teams x projects float
+    matrix is built on the way.
+    """
+    if len(sheets) != 3:
+        raise ValueError("Expected the impact, capability and preference sheet names")
+
+    if filename.lower().endswith(".npz"):
+        return read_npz(filename, dtype, sparse)
+
+    if not use_cache:
+        return read_workbook(filename, sheets, header_rows, label_columns, dtype, blanks, sparse)
+
+    stat = os.stat(filename)
+    path = cache_path(filename, sheets, header_rows, label_columns, cache_dir, dtype, blanks, sparse)
+    data = read_cache(path, filename, stat)
+    if data is not None:
+        return data
+
+    data = read_workbook(filename, sheets, header_rows, label_columns, dtype, blanks, sparse)
+    try:
+        write_cache(path, data, file_digest(filename), stat)
+    except OSError:
+        # A read-only data directory should not stop the analysis
+        pass
+    return data
@@ -0,0 +1,135 @@
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from profiling import profiled
+
+# Exit flags follow the MATLAB intlinprog convention used by get_allocations.m
+OPTIMAL = 1
+INFEASIBLE = -2
+
+
+class AllocationResult(object):
+    """Outcome of an allocation solve.
+
+    ``assignment[i]`` is the project index given to team i, or -1 when the team
+    is unallocated. ``objective`` is the total b value of the allocation (the
+    allocation satisfaction coefficient of get_allocations.m), ``runtime`` is in
+    seconds and ``exitflag`` is 1 for an optimal allocation and -2 when the
+    constraints cannot be met.
+    """
+
+    def __init__(self, assignment, objective, runtime, exitflag, status):
+        self.assignment = assignment
+        self.objective = objective
+        self.runtime = runtime
+        self.exitflag = exitflag
+        self.status = status
+
+    @property
+    def feasible(self):
+        return self.exitflag == OPTIMAL
+
+    def pairs(self):
+        # (team, project) index pairs of every allocated team
+        teams = np.flatnonzero(self.assignment >= 0)
+        return list(zip(teams.tolist(), self.assignment[teams].tolist()))
+
+    def matrix(self, project_count):
+        # Teams x projects 0/1 matrix, the same shape as the MATLAB assignments
+        allocation = np.zeros((len(self.assignment), project_count), dtype=np.int8)
+        teams = np.flatnonzero(self.assignment >= 0)
+        allocation[teams, self.assignment[teams]] = 1
+        return allocation
+
+    def __repr__(self):
+        return (f"AllocationResult(status={self.status}, objective={self.objective}, "
+                f"runtime={self.runtime:.4f}s)")
+
+
+def _pairs_array(pairs):
+    pairs = np.asarray(pairs, dtype=np.intp).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def _check_finite(b_values, limit=10):
+    # A NaN or infinite b value (e.g. a blank workbook cell read as NaN) is bad
+    # input, not an infeasible allocation, so it is reported with its cells
+    bad = np.argwhere(~np.isfinite(b_values))
+    if len(bad):
+        shown = ", ".join(f"({team}, {project})" for team, project in bad[:limit].tolist())
+        more = f" and {len(bad) - limit} more" if len(bad) > limit else ""
+        raise ValueError(f"b_values has {len(bad)} non-finite entries at (team, project) {shown}{more}")
+
+
+def _infeasible(team_count, start, status="infeasible"):
+    return AllocationResult(np.full(team_count, -1, dtype=np.intp), np.nan,
+                            time.perf_counter() - start, INFEASIBLE, status)
+
+
+@profiled("allocate")
+def solve_allocation(b_values, forced=(), forbidden=(), capacities=None, allow_unassigned=False):
+    """Optimal allocation of teams to projects maximising the total b value.
+
+    ``forced`` (P in get_allocations.m) and ``forbidden`` (Q) are sequences of
+    zero-based (team, project) pairs, and ``capacities`` (R) gives the maximum
+    number of teams per project, defaulting to 1. Every team must receive a
+    project unless ``allow_unassigned`` is set.
+
+    Every b value must be finite, a ValueError names any that are not.
+    Forced pairs are fixed before solving and forbidden pairs can never be
+    chosen, rather than the +-1000 weights of the MATLAB model. Capacities are
+    handled by repeating each project's column once per available place and
+    solving the resulting rectangular assignment problem.
+    """
+    start = time.perf_counter()
+    b_values = np.asarray(b_values, dtype=np.float64)
+    team_count, project_count = b_values.shape
+    _check_finite(b_values)
+
+    if capacities is None:
+        capacities = np.ones(project_count, dtype=np.intp)
+    capacities = np.asarray(capacities, dtype=np.intp)
+    if capacities.shape != (project_count,) or np.any(capacities < 0):
+        raise ValueError("capacities must hold one non-negative count per project")
+
+    forced_teams, forced_projects = _pairs_array(forced)
+    forbidden_teams, forbidden_projects = _pairs_array(forbidden)
+
+    allowed = np.ones((team_count, project_count), dtype=bool)
+    allowed[forbidden_teams, forbidden_projects] = False
+
+    assignment = np.full(team_count, -1, dtype=np.intp)
+    if len(np.unique(forced_teams)) != len(forced_teams):
+        return _infeasible(team_count, start, "team forced to more than one project")
+    if not np.all(allowed[forced_teams, forced_projects]):
+        return _infeasible(team_count, start, "pair both forced and forbidden")
+    assignment[forced_teams] = forced_projects
+
+    remaining = capacities - np.bincount(forced_projects, minlength=project_count)
+    if np.any(remaining < 0):
+        return _infeasible(team_count, start, "forced pairs exceed project capacity")
+
+    free_teams = np.flatnonzero(assignment < 0)
+    columns = np.repeat(np.arange(project_count), remaining)
+
+    cost = np.where(allowed[free_teams], -b_values[free_teams], np.inf)[:, columns]
+    if allow_unassigned:
+        # One zero valued dummy place per team lets it go unallocated
+        cost = np.hstack((cost, np.zeros((len(free_teams), len(free_teams)))))
+
+    if len(free_teams):
+        if cost.shape[1] < len(free_teams):
+            return _infeasible(team_count, start, "not enough project places for every team")
+        try:
+            rows, places = linear_sum_assignment(cost)
+        except ValueError:
+            # The forbidden pairs leave no complete assignment
+            return _infeasible(team_count, start)
+        real = places < len(columns)
+        assignment[free_teams[rows[real]]] = columns[places[real]]
+
+    teams = np.flatnonzero(assignment >= 0)
+    objective = float(b_values[teams, assignment[teams]].sum())
+    return AllocationResult(assignment, objective, time.perf_counter() - start, OPTIMAL, "optimal")
@@ -0,0 +1,17 @@
+import numpy as np
+
+import sparse_support
+from profiling import profiled
+
+
+@profiled("b_values")
+def calculate_b_values(impact, capability, preference, pref_scalar=0.1, alpha=1):
+    # A sparse impact matrix gives a CSR matrix of b values computed only where
+    # the impact is non-zero. Fit and preference are then either CSR matrices
+    # on the impact's structure (AllocationData.to_sparse) or dense
+    if sparse_support.issparse(impact):
+        impact = sparse_support.as_csr(impact)
+        data = impact.data * (alpha * sparse_support.gather(capability, impact)
+                              + pref_scalar * sparse_support.gather(preference, impact))
+        return sparse_support.as_csr(sparse_support.with_data(impact, data))
+    return impact * (alpha * capability + pref_scalar * preference)
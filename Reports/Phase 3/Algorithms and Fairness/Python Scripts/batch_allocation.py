@@ -0,0 +1,248 @@
+import glob
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from allocation_data import BLANK_POLICIES, CACHE_DIR, DEFAULT_SHEETS, SAMPLE_LAYOUT, load_allocation_data
+from allocator import INFEASIBLE, OPTIMAL, solve_allocation
+from b_values import calculate_b_values
+from fairness_allocator import solve_fair_allocation
+from profiling import profile_from_environment
+from stable_matching import gale_shapley
+
+BATCH_COLUMNS = ("cohort", "workbook", "allocator", "alpha", "pref_scalar", "team", "project",
+                 "b_value", "objective", "exitflag", "status", "runtime", "error")
+WORKBOOK_PATTERNS = ("*.xlsx", "*.npz")
+
+
+def _optimal(b_values, capacities, allow_unassigned):
+    result = solve_allocation(b_values, capacities=capacities, allow_unassigned=allow_unassigned)
+    return result.assignment, result.objective, result.exitflag, result.status
+
+
+def _fairness(b_values, capacities, allow_unassigned):
+    result = solve_fair_allocation(b_values, capacities=capacities, allow_unassigned=allow_unassigned)
+    return result.assignment, result.objective, result.exitflag, result.status
+
+
+def _stable(b_values, capacities, allow_unassigned):
+    # Deferred acceptance always terminates, but teams it cannot place stay
+    # unassigned, which only meets the constraints with allow_unassigned
+    result = gale_shapley(b_values, capacities)
+    unassigned = int(np.count_nonzero(result.assignment < 0))
+    if unassigned and not allow_unassigned:
+        return result.assignment, result.objective, INFEASIBLE, f"stable, {unassigned} teams unassigned"
+    return result.assignment, result.objective, OPTIMAL, "stable"
+
+
+# name -> function(b_values, capacities, allow_unassigned) returning
+# (assignment, objective, exitflag, status)
+ALLOCATORS = {
+    "optimal": _optimal,
+    "fairness": _fairness,
+    "stable": _stable,
+}
+
+
+def discover_workbooks(directory, patterns=WORKBOOK_PATTERNS, recursive=False, exclude=()):
+    """Every cohort workbook in ``directory``, sorted by name.
+
+    Excel lock files (``~$...``), the loader's own ``.allocation_cache`` files
+    and the paths in ``exclude`` (e.g. an earlier results workbook) are
+    skipped.
+    """
+    excluded = {os.path.abspath(path) for path in exclude}
+    found = set()
+    for pattern in patterns:
+        if recursive:
+            pattern = os.path.join("**", pattern)
+        found.update(glob.glob(os.path.join(directory, pattern), recursive=recursive))
+    return sorted(path for path in found
+                  if not os.path.basename(path).startswith("~$")
+                  and CACHE_DIR not in os.path.normpath(path).split(os.sep)
+                  and os.path.abspath(path) not in excluded)
+
+
+def detect_layout(filename):
+    # load_allocation_data keyword arguments for the workbook's sheet layout:
+    # the IFB398 impact/fit/pref layout or the Prototype System Sample layout
+    if filename.lower().endswith(".npz"):
+        return {}
+    sheets = set(pd.ExcelFile(filename).sheet_names)
+    if sheets.issuperset(DEFAULT_SHEETS):
+        return {}
+    if sheets.issuperset(sheet for sheet in SAMPLE_LAYOUT["sheets"] if sheet is not None):
+        return dict(SAMPLE_LAYOUT)
+    raise ValueError(f"Unrecognised sheets {sorted(sheets)}, expected {list(DEFAULT_SHEETS)} "
+                     f"or {[sheet for sheet in SAMPLE_LAYOUT['sheets'] if sheet is not None]}")
+
+
+def cohort_name(filename, directory):
+    return os.path.splitext(os.path.relpath(filename, directory))[0]
+
+
+def _error_rows(cohort, filename, allocator, alpha, pref_scalar, message, runtime):
+    return pd.DataFrame([{
+        "cohort": cohort, "workbook": filename, "allocator": allocator, "alpha": alpha,
+        "pref_scalar": pref_scalar, "team": None, "project": None, "b_value": np.nan,
+        "objective": np.nan, "exitflag": np.nan, "status": "error", "runtime": runtime,
+        "error": message,
+    }], columns=BATCH_COLUMNS)
+
+
+def allocate_cohort(filename, directory, allocator="optimal", pref_scalar=0.1, alpha=1,
+                    allow_unassigned=False, use_cache=True, blanks="nan"):
+    """Loads, scores and allocates one workbook.
+
+    Returns its tidy rows, one per team. Any failure (unreadable workbook,
+    unknown layout, bad cells, solver error) becomes a single row with status
+    "error" and the message, so one cohort can never abort a batch.
+    """
+    start = time.perf_counter()
+    cohort = cohort_name(filename, directory)
+    try:
+        data = load_allocation_data(filename, use_cache=use_cache, blanks=blanks,
+                                    **detect_layout(filename))
+        b_values = calculate_b_values(data.impact, data.capability, data.preference, pref_scalar, alpha)
+        if hasattr(b_values, "toarray"):
+            b_values = b_values.toarray()
+        assignment, objective, exitflag, status = ALLOCATORS[allocator](b_values, None, allow_unassigned)
+    except Exception as error:
+        message = "".join(traceback.format_exception_only(type(error), error)).strip()
+        return _error_rows(cohort, filename, allocator, alpha, pref_scalar, message,
+                           time.perf_counter() - start)
+
+    team_count = len(data.team_names)
+    allocated = assignment >= 0
+    projects = np.where(allocated, assignment, 0)
+    obtained = np.where(allocated, b_values[np.arange(team_count), projects], np.nan)
+    return pd.DataFrame({
+        "cohort": cohort,
+        "workbook": filename,
+        "allocator": allocator,
+        "alpha": alpha,
+        "pref_scalar": pref_scalar,
+        "team": data.team_names,
+        "project": np.where(allocated, np.asarray(data.project_names)[projects], None),
+        "b_value": obtained,
+        "objective": objective,
+        "exitflag": exitflag,
+        "status": status,
+        "runtime": time.perf_counter() - start,
+        "error": None,
+    }, columns=BATCH_COLUMNS)
+
+
+def write_batch_results(results, path):
+    # CSV by default, .xlsx and .parquet by extension
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".xlsx":
+        results.to_excel(path, index=False)
+    elif extension == ".parquet":
+        results.to_parquet(path, index=False)
+    else:
+        results.to_csv(path, index=False)
+
+
+def run_batch(directory, allocator="optimal", pref_scalar=0.1, alpha=1, allow_unassigned=False,
+              processes=None, use_cache=True, blanks="nan", recursive=False, exclude=(), progress=None):
+    """Allocates every workbook in ``directory`` and returns one results table.
+
+    Cohorts are spread over ``processes`` worker processes (all cores by
+    default, ``processes=1`` runs them here). Each cohort is its own task,
+    largest workbook first, and results are collected as they finish, so a
+    slow cohort only ever occupies one worker. ``progress`` is called with
+    each cohort's rows as soon as it is done. ``blanks`` is passed on to
+    ``load_allocation_data``, a blank cell left as NaN makes that cohort an
+    "error" row naming the cell.
+
+    Failed cohorts are kept in the table as one "error" row each, see
+    ``allocate_cohort``. A worker process that dies (e.g. killed for memory)
+    is reported the same way for the cohorts it took down.
+    """
+    if allocator not in ALLOCATORS:
+        raise ValueError(f"Unknown allocator {allocator!r}, expected one of {sorted(ALLOCATORS)}")
+    filenames = discover_workbooks(directory, recursive=recursive, exclude=exclude)
+    # Largest first keeps the big cohorts from starting last and finishing late
+    filenames.sort(key=os.path.getsize, reverse=True)
+    arguments = (directory, allocator, pref_scalar, alpha, allow_unassigned, use_cache, blanks)
+
+    frames = []
+
+    def collect(rows):
+        frames.append(rows)
+        if progress is not None:
+            progress(rows)
+
+    if processes == 1 or len(filenames) <= 1:
+        for filename in filenames:
+            collect(allocate_cohort(filename, *arguments))
+    else:
+        processes = min(processes or os.cpu_count() or 1, len(filenames))
+        with ProcessPoolExecutor(processes) as pool:
+            futures = {pool.submit(allocate_cohort, filename, *arguments): filename
+                       for filename in filenames}
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    rows = future.result()
+                except BrokenProcessPool as error:
+                    rows = _error_rows(cohort_name(filename, directory), filename, allocator, alpha,
+                                       pref_scalar, f"Worker process died: {error}", np.nan)
+                collect(rows)
+
+    if not frames:
+        return pd.DataFrame(columns=BATCH_COLUMNS)
+    results = pd.concat(frames, ignore_index=True)
+    return results.sort_values(["cohort"], kind="stable", ignore_index=True)
+
+
+def batch_summary(results):
+    # One row per cohort: status, objective, allocated teams and runtime
+    grouped = results.groupby("cohort", sort=True)
+    return grouped.agg(status=("status", "first"), objective=("objective", "first"),
+                       teams=("team", "count"), allocated=("project", "count"),
+                       mean_b_value=("b_value", "mean"), runtime=("runtime", "first"),
+                       error=("error", "first")).reset_index()
+
+
+def _print_progress(rows):
+    row = rows.iloc[0]
+    if row["status"] == "error":
+        print(f"{row['cohort']}: FAILED {row['error']}", file=sys.stderr)
+    else:
+        print(f"{row['cohort']}: {row['status']}, objective {row['objective']:.2f}, "
+              f"{rows['project'].notna().sum()}/{len(rows)} teams allocated in {row['runtime']:.2f}s")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Allocate every cohort workbook in a directory")
+    parser.add_argument("directory")
+    parser.add_argument("--allocator", default="optimal", choices=sorted(ALLOCATORS))
+    parser.add_argument("--pref-scalar", type=float, default=0.1)
+    parser.add_argument("--alpha", type=float, default=1)
+    parser.add_argument("--allow-unassigned", action="store_true",
+                        help="let teams go unallocated when there are fewer places than teams")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--recursive", action="store_true", help="also search subdirectories")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the workbooks")
+    parser.add_argument("--blanks", default="nan", choices=BLANK_POLICIES, help="how blank cells are read")
+    parser.add_argument("--output", default="batch_results.csv", help=".csv, .xlsx or .parquet")
+    args = parser.parse_args()
+
+    profile_from_environment()
+    results = run_batch(args.directory, args.allocator, args.pref_scalar, args.alpha,
+                        args.allow_unassigned, args.processes, not args.no_cache, args.blanks,
+                        args.recursive, exclude=[args.output], progress=_print_progress)
+    write_batch_results(results, args.output)
+    failed = results.loc[results["status"] == "error", "cohort"].nunique()
+    print(f"{results['cohort'].nunique()} cohorts, {failed} failed, results in {args.output}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,276 @@
+import glob
+import json
+import math
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+
+from allocation_data import SAMPLE_LAYOUT, load_allocation_data, save_allocation_npz
+from allocator import solve_allocation
+from b_values import calculate_b_values
+from contention import contention_index
+from fairness_allocator import solve_fair_allocation
+from overlap import calculate_top_overlap
+from stable_matching import gale_shapley
+from synthetic_cohort import generate_cohort
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_DIR = os.path.join(HERE, "..", "..", "..", "..", "Prototype System", "tests")
+BASELINE_FILE = os.path.join(HERE, "benchmark_baseline.json")
+# Synthetic scale tiers, teams x projects
+TIERS = {
+    "small": (200, 50),
+    "medium": (2000, 400),
+    "large": (10000, 2000),
+    "xlarge": (30000, 5000),
+}
+# The overlap matrix and the optimal allocator are dense in the number of
+# teams, above this they are skipped instead of running out of memory
+DENSE_TEAM_LIMIT = 5000
+
+
+class StageResult(object):
+    """Timing, memory and quality of one pipeline stage on one dataset.
+
+    ``seconds`` is the best wall time over the repeats, ``peak_bytes`` the
+    tracemalloc peak of a separate traced run and ``objective`` the total b
+    value of the allocation for the allocator stages (None otherwise).
+    """
+
+    def __init__(self, dataset, stage, teams, projects, seconds=None, peak_bytes=None,
+                 objective=None, skipped=None):
+        self.dataset = dataset
+        self.stage = stage
+        self.teams = teams
+        self.projects = projects
+        self.seconds = seconds
+        self.peak_bytes = peak_bytes
+        self.objective = objective
+        self.skipped = skipped
+
+    @property
+    def key(self):
+        return f"{self.dataset}/{self.stage}"
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        if self.skipped:
+            return f"{self.key:<28} skipped ({self.skipped})"
+        objective = "" if self.objective is None else f"  objective {self.objective:.2f}"
+        return (f"{self.key:<28} {self.seconds * 1000:10.2f} ms "
+                f"{self.peak_bytes / 2 ** 20:10.2f} MiB{objective}")
+
+
+def measure(function, repeat=3):
+    """Best wall time of ``repeat`` runs plus the tracemalloc peak of one more.
+
+    Tracing slows allocation down, so the peak comes from its own run and does
+    not distort the timings. Returns ``(seconds, peak_bytes, value)`` where
+    ``value`` is what the last timed call returned.
+    """
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = math.inf
+    value = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        value = function()
+        best = min(best, time.perf_counter() - start)
+    return best, peak, value
+
+
+def _capacities(team_count, project_count):
+    # Just enough places on every project for all teams to be allocated
+    return np.full(project_count, -(-team_count // project_count), dtype=np.int64)
+
+
+def benchmark_pipeline(name, data, load, repeat=3, load_cached=None):
+    """Times every stage of the allocation pipeline on one cohort.
+
+    ``load`` (and the optional ``load_cached``) re-read the cohort from disk.
+    The stages are loading, b values, the top 50% overlap, the contention index
+    and the optimal, stable and max-min fairness allocators. The fairness
+    allocator is timed twice, as ``bottleneck`` without its total b value
+    tie-break and as ``fairness`` with it.
+    """
+    teams, projects = data.shape
+    results = []
+
+    def run(stage, function, objective=None, skipped=None):
+        if skipped:
+            results.append(StageResult(name, stage, teams, projects, skipped=skipped))
+            return None
+        seconds, peak, value = measure(function, repeat)
+        score = None if objective is None else float(objective(value))
+        results.append(StageResult(name, stage, teams, projects, seconds, peak, score))
+        return value
+
+    run("load", load)
+    if load_cached is not None:
+        run("load_cached", load_cached)
+
+    b_values = run("b_values", lambda: calculate_b_values(
+        data.impact, data.capability, data.preference))
+
+    too_large = f"more than {DENSE_TEAM_LIMIT} teams" if teams > DENSE_TEAM_LIMIT else None
+    run("overlap", lambda: calculate_top_overlap(b_values, divisor=2), skipped=too_large)
+    run("lambda", lambda: contention_index(b_values, divisor=2))
+
+    capacities = _capacities(teams, projects)
+    run("optimal", lambda: solve_allocation(b_values, capacities=capacities),
+        objective=lambda result: result.objective, skipped=too_large)
+    run("stable", lambda: gale_shapley(b_values, capacities=capacities),
+        objective=lambda result: result.objective)
+    run("bottleneck", lambda: solve_fair_allocation(b_values, capacities=capacities, tie_break=False),
+        objective=lambda result: result.objective, skipped=too_large)
+    run("fairness", lambda: solve_fair_allocation(b_values, capacities=capacities),
+        objective=lambda result: result.objective, skipped=too_large)
+    return results
+
+
+def sample_files(directory=SAMPLE_DIR):
+    # Sample1.xlsx .. Sample15.xlsx in numeric order
+    def number(path):
+        match = re.search(r"(\d+)", os.path.basename(path))
+        return int(match.group(1)) if match else 0
+    return sorted(glob.glob(os.path.join(directory, "Sample*.xlsx")), key=number)
+
+
+def benchmark_samples(directory=SAMPLE_DIR, repeat=3):
+    results = []
+    cache_dir = tempfile.mkdtemp(prefix="allocation_benchmark_")
+    try:
+        for filename in sample_files(directory):
+            name = os.path.splitext(os.path.basename(filename))[0]
+
+            def load(filename=filename):
+                return load_allocation_data(filename, use_cache=False, **SAMPLE_LAYOUT)
+
+            def load_cached(filename=filename):
+                return load_allocation_data(filename, cache_dir=cache_dir, **SAMPLE_LAYOUT)
+
+            load_cached()
+            results.extend(benchmark_pipeline(name, load(), load, repeat, load_cached))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return results
+
+
+def benchmark_tiers(tiers, repeat=3, seed=0):
+    # Synthetic cohorts are loaded from .npz, workbooks of this size are not realistic
+    results = []
+    directory = tempfile.mkdtemp(prefix="allocation_benchmark_")
+    try:
+        for tier in tiers:
+            teams, projects = TIERS[tier]
+            data = generate_cohort(teams, projects, seed=seed)
+            path = os.path.join(directory, f"{tier}.npz")
+            save_allocation_npz(data, path)
+            results.extend(benchmark_pipeline(
+                f"synthetic-{tier}", data, lambda path=path: load_allocation_data(path), repeat))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write_results(results, filename):
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "environment": environment(),
+              "results": [result.to_dict() for result in results]}
+    with open(filename, "w") as handle:
+        json.dump(report, handle, indent=1)
+    return report
+
+
+def read_results(filename):
+    with open(filename) as handle:
+        report = json.load(handle)
+    return [StageResult(**entry) for entry in report["results"]]
+
+
+def compare(results, baseline, time_tolerance=1.0, memory_tolerance=0.25,
+            objective_tolerance=1e-6, min_seconds=0.005, min_bytes=1 << 20):
+    """Regressions of ``results`` against the ``baseline`` results.
+
+    A stage regresses when it is more than ``time_tolerance`` (relative) slower
+    and at least ``min_seconds`` slower, so timer noise on tiny fixtures is not
+    reported, when its peak memory grew by more than ``memory_tolerance`` and
+    ``min_bytes`` or when its objective changed. Stages missing from either side are ignored.
+    Returns a list of messages, empty when nothing regressed.
+    """
+    expected = {result.key: result for result in baseline}
+    regressions = []
+    for result in results:
+        before = expected.get(result.key)
+        if before is None or result.skipped or before.skipped:
+            continue
+        if (result.seconds > before.seconds * (1 + time_tolerance)
+                and result.seconds - before.seconds >= min_seconds):
+            regressions.append(f"{result.key}: {result.seconds:.4f}s, baseline {before.seconds:.4f}s")
+        if (result.peak_bytes > before.peak_bytes * (1 + memory_tolerance)
+                and result.peak_bytes - before.peak_bytes >= min_bytes):
+            regressions.append(f"{result.key}: peak {result.peak_bytes} bytes, "
+                               f"baseline {before.peak_bytes} bytes")
+        if before.objective is not None and (
+                result.objective is None
+                or abs(result.objective - before.objective) > objective_tolerance * max(1.0, abs(before.objective))):
+            regressions.append(f"{result.key}: objective {result.objective}, baseline {before.objective}")
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the allocation pipeline")
+    parser.add_argument("--tiers", nargs="*", default=["small", "medium"], choices=sorted(TIERS),
+                        help="synthetic scale tiers to run")
+    parser.add_argument("--no-samples", action="store_true",
+                        help="skip the Prototype System Sample workbooks")
+    parser.add_argument("--samples", default=SAMPLE_DIR, help="directory of Sample*.xlsx fixtures")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = [] if args.no_samples else benchmark_samples(args.samples, args.repeat)
+    results += benchmark_tiers(args.tiers, args.repeat)
+    for result in results:
+        print(result)
+    write_results(results, args.output)
+
+    if args.update_baseline:
+        write_results(results, args.baseline)
+    elif os.path.exists(args.baseline):
+        regressions = compare(results, read_results(args.baseline), time_tolerance=args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,50 @@
+import numpy as np
+
+from overlap import TopProjects, top_fraction
+from profiling import profiled
+
+
+@profiled("contention")
+def project_contention(top):
+    """Number of teams that have each project among their top projects.
+
+    ``top`` is a ``TopProjects`` from ``overlap.top_fraction`` or a boolean
+    teams x projects indicator. Higher counts mark projects that many teams
+    compete for.
+    """
+    if isinstance(top, TopProjects):
+        return np.bincount(top.indices, minlength=top.project_count)
+    return np.asarray(top, dtype=bool).sum(axis=0)
+
+
+@profiled("lambda")
+def calculate_lambda(top, contention=None):
+    """Contention index lambda of every team.
+
+    For team i with top projects P_i, lambda_i is the mean over p in P_i of the
+    number of *other* teams that also have p in their top projects, or 0 when
+    P_i is empty. ``contention`` can be passed when it is already known.
+    """
+    if contention is None:
+        contention = project_contention(top)
+
+    # Every team counts itself once in the contention of its own top projects
+    others = (contention - 1).astype(np.float64)
+    if isinstance(top, TopProjects):
+        sizes = top.sizes()
+        totals = np.bincount(top.rows(), weights=others[top.indices], minlength=top.team_count)
+    else:
+        top = np.asarray(top, dtype=bool)
+        sizes = top.sum(axis=1)
+        totals = top.astype(np.float64) @ others
+
+    lambda_values = np.zeros(top.shape[0])
+    np.divide(totals, sizes, out=lambda_values, where=sizes > 0)
+    return lambda_values
+
+
+def contention_index(b_values_matrix, divisor=2, positional=False):
+    # Returns (lambda per team, contention per project) for a b value matrix
+    top = top_fraction(b_values_matrix, divisor, positional)
+    contention = project_contention(top)
+    return calculate_lambda(top, contention), contention
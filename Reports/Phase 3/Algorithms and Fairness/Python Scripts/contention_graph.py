@@ -0,0 +1,333 @@
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
+
+from profiling import profiled
+
+
+def default_labels(team_count):
+    return [f"Team {team + 1}" for team in range(team_count)]
+
+
+def threshold_adjacency(overlap, threshold, strict=False):
+    """Undirected teams x teams CSR adjacency of an overlap matrix.
+
+    Teams i and j are joined when ``overlap[i, j]`` or ``overlap[j, i]`` is at
+    least ``threshold`` (above it with ``strict``), like adding both directions
+    to an undirected networkx graph. ``overlap`` can be a dense array or a SciPy
+    sparse matrix from ``overlap_percentages(..., backend="sparse")``, which
+    only stores non-zero overlaps, so there a threshold of 0 or below does not
+    join teams without any overlap. Self loops are dropped.
+    """
+    if sparse.issparse(overlap):
+        overlap = overlap.tocoo()
+        keep = overlap.data > threshold if strict else overlap.data >= threshold
+        rows, columns = overlap.row[keep], overlap.col[keep]
+    else:
+        overlap = np.asarray(overlap)
+        rows, columns = np.nonzero(overlap > threshold if strict else overlap >= threshold)
+    off_diagonal = rows != columns
+    rows, columns = rows[off_diagonal], columns[off_diagonal]
+
+    team_count = overlap.shape[0]
+    adjacency = sparse.csr_matrix(
+        (np.ones(2 * len(rows), dtype=np.int8),
+         (np.concatenate((rows, columns)), np.concatenate((columns, rows)))),
+        shape=(team_count, team_count))
+    # Duplicate entries were summed, keep the matrix binary
+    adjacency.data[:] = 1
+    return adjacency
+
+
+class ContentionGraph(object):
+    """Teams joined by heavily overlapping top project choices.
+
+    Nodes are the integer team indices 0..n-1 and ``adjacency`` is a symmetric
+    0/1 CSR matrix, ``labels[i]`` is the display name of team i. Use
+    ``from_overlap`` to threshold an overlap matrix.
+    """
+
+    def __init__(self, adjacency, labels=None, threshold=None):
+        self.adjacency = sparse.csr_matrix(adjacency)
+        self.labels = list(labels) if labels is not None else default_labels(self.adjacency.shape[0])
+        self.threshold = threshold
+
+    @classmethod
+    @profiled("contention_graph")
+    def from_overlap(cls, overlap, threshold, strict=False, labels=None):
+        return cls(threshold_adjacency(overlap, threshold, strict), labels, threshold)
+
+    @property
+    def node_count(self):
+        return self.adjacency.shape[0]
+
+    @property
+    def edge_count(self):
+        return self.adjacency.nnz // 2
+
+    def degrees(self):
+        return np.diff(self.adjacency.indptr)
+
+    def isolated(self):
+        return np.flatnonzero(self.degrees() == 0)
+
+    def edges(self):
+        # (u, v) index arrays of every edge once, with u < v
+        upper = sparse.triu(self.adjacency, k=1).tocoo()
+        order = np.lexsort((upper.col, upper.row))
+        return upper.row[order], upper.col[order]
+
+    def components(self):
+        """``(count, component)``, where ``component[i]`` numbers team i's component."""
+        return connected_components(self.adjacency, directed=False)
+
+    def component_sizes(self):
+        _, component = self.components()
+        return np.bincount(component)
+
+    def clustering(self):
+        """Local clustering coefficient of every team, as ``networkx.clustering``.
+
+        Twice the triangles through a node are the non-zero entries of
+        ``(A @ A) * A`` in its row, divided by ``degree * (degree - 1)``.
+        """
+        adjacency = self.adjacency.astype(np.int64)
+        closed = np.asarray((adjacency @ adjacency).multiply(adjacency).sum(axis=1)).ravel()
+        degrees = self.degrees()
+        possible = degrees * (degrees - 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(possible > 0, closed / possible, 0.0)
+
+    def to_networkx(self):
+        import networkx as nx
+
+        graph = nx.Graph()
+        graph.add_nodes_from(range(self.node_count))
+        graph.add_edges_from(zip(*(side.tolist() for side in self.edges())))
+        return graph
+
+    def layout(self, seed=0, iterations=50):
+        """Spring layout as an n x 2 array of node positions (needs networkx)."""
+        import networkx as nx
+
+        positions = nx.spring_layout(self.to_networkx(), seed=seed, iterations=iterations)
+        return np.array([positions[node] for node in range(self.node_count)])
+
+    def write_edge_list(self, path, use_labels=False):
+        # One "u v" line per edge, readable by networkx.read_edgelist
+        rows, columns = self.edges()
+        with open(path, "w", encoding="utf-8") as handle:
+            for u, v in zip(rows.tolist(), columns.tolist()):
+                if use_labels:
+                    handle.write(f"{self.labels[u]}\t{self.labels[v]}\n")
+                else:
+                    handle.write(f"{u} {v}\n")
+
+    def write_graphml(self, path, node_data=None):
+        """Writes the graph as GraphML with a ``label`` attribute per node.
+
+        ``node_data`` maps extra attribute names to per-team numeric arrays,
+        e.g. ``{"lambda": lambda_values}``.
+        """
+        node_data = node_data or {}
+        rows, columns = self.edges()
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                         '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                         '  <key id="label" for="node" attr.name="label" attr.type="string"/>\n')
+            for name in node_data:
+                handle.write(f'  <key id={quoteattr(name)} for="node" attr.name={quoteattr(name)} '
+                             f'attr.type="double"/>\n')
+            handle.write('  <graph id="contention" edgedefault="undirected">\n')
+            for node in range(self.node_count):
+                handle.write(f'    <node id="n{node}"><data key="label">{escape(str(self.labels[node]))}</data>')
+                for name, values in node_data.items():
+                    handle.write(f'<data key={quoteattr(name)}>{float(values[node])!r}</data>')
+                handle.write('</node>\n')
+            for u, v in zip(rows.tolist(), columns.tolist()):
+                handle.write(f'    <edge source="n{u}" target="n{v}"/>\n')
+            handle.write('  </graph>\n</graphml>\n')
+
+    def draw(self, ax, positions=None, labels=None, hide_isolated=False, node_color="lightblue",
+             node_size=300, font_size=8):
+        """Draws the graph with one LineCollection for the edges and one scatter for the nodes.
+
+        ``positions`` defaults to ``layout()`` and ``labels`` to ``self.labels``.
+        With ``hide_isolated`` teams without edges are left out, as in a networkx
+        graph built only from its edges.
+        """
+        from matplotlib.collections import LineCollection
+
+        positions = self.layout() if positions is None else np.asarray(positions)
+        labels = self.labels if labels is None else labels
+        nodes = np.flatnonzero(self.degrees() > 0) if hide_isolated else np.arange(self.node_count)
+
+        rows, columns = self.edges()
+        ax.add_collection(LineCollection(np.stack((positions[rows], positions[columns]), axis=1),
+                                         colors="black", linewidths=1, zorder=1))
+        ax.scatter(positions[nodes, 0], positions[nodes, 1], s=node_size, c=node_color, zorder=2)
+        for node in nodes.tolist():
+            ax.text(positions[node, 0], positions[node, 1], labels[node], fontsize=font_size,
+                    ha="center", va="center", zorder=3)
+        ax.autoscale_view()
+        ax.set_axis_off()
+
+
+class ContentionGraphs(object):
+    """Contention graphs of one overlap matrix at many thresholds.
+
+    Graphs and their spring layouts are built on first use and cached per
+    threshold, so redrawing or exporting the same threshold costs nothing.
+    """
+
+    def __init__(self, overlap, strict=False, labels=None):
+        self.overlap = overlap
+        self.strict = strict
+        self.labels = labels if labels is not None else default_labels(overlap.shape[0])
+        self._graphs = {}
+        self._layouts = {}
+
+    def graph(self, threshold):
+        if threshold not in self._graphs:
+            self._graphs[threshold] = ContentionGraph.from_overlap(
+                self.overlap, threshold, self.strict, self.labels)
+        return self._graphs[threshold]
+
+    def layout(self, threshold, seed=0):
+        key = (threshold, seed)
+        if key not in self._layouts:
+            self._layouts[key] = self.graph(threshold).layout(seed=seed)
+        return self._layouts[key]
+
+    def draw(self, ax, threshold, seed=0, **options):
+        graph = self.graph(threshold)
+        graph.draw(ax, self.layout(threshold, seed), **options)
+        return graph
+
+
+class ThresholdSweep(object):
+    """Contention graph statistics at many thresholds of one overlap matrix.
+
+    Every array has one entry per threshold: ``edge_count``, the number of
+    connected ``components``, the ``largest_component`` size and the number of
+    ``isolated`` teams.
+    """
+
+    def __init__(self, thresholds, edge_count, components, largest_component, isolated):
+        self.thresholds = thresholds
+        self.edge_count = edge_count
+        self.components = components
+        self.largest_component = largest_component
+        self.isolated = isolated
+
+    def __repr__(self):
+        lines = ["threshold      edges components    largest   isolated"]
+        for row in zip(self.thresholds.tolist(), self.edge_count.tolist(), self.components.tolist(),
+                       self.largest_component.tolist(), self.isolated.tolist()):
+            lines.append("{:9g} {:10d} {:10d} {:10d} {:10d}".format(*row))
+        return "\n".join(lines)
+
+
+def _pair_weights(overlap, minimum, strict):
+    # Upper triangle CSR of max(overlap[i, j], overlap[j, i]), the overlap at
+    # which the undirected edge i-j appears, keeping only pairs that reach
+    # ``minimum`` (the lowest positive threshold of the sweep)
+    if sparse.issparse(overlap):
+        overlap = sparse.csr_matrix(overlap, dtype=np.float64)
+        weights = sparse.triu(overlap.maximum(overlap.T), k=1).tocoo()
+        keep = weights.data > minimum if strict else weights.data >= minimum
+        rows, columns, values = weights.row[keep], weights.col[keep], weights.data[keep]
+    else:
+        overlap = np.asarray(overlap, dtype=np.float64)
+        weights = np.maximum(overlap, overlap.T)
+        rows, columns = np.nonzero(np.triu(weights > minimum if strict else weights >= minimum, k=1))
+        values = weights[rows, columns]
+    positive = values > 0
+    return sparse.csr_matrix((values[positive], (rows[positive], columns[positive])), shape=overlap.shape)
+
+
+def _count_at_least(sorted_values, thresholds, strict):
+    # How many of the ascending values are >= (or > with strict) each threshold
+    side = "right" if strict else "left"
+    return len(sorted_values) - np.searchsorted(sorted_values, thresholds, side=side)
+
+
+@profiled("threshold_sweep")
+def threshold_sweep(overlap, thresholds, strict=False):
+    """Edge, component and isolated team counts at every threshold in one pass.
+
+    The pair weights ``max(overlap[i, j], overlap[j, i])`` are sorted once, so
+    edge and isolated counts at any threshold are binary searches. Components
+    only change along a maximum spanning forest of the weights, so a single
+    union-find pass over its at most n - 1 edges, strongest first, records the
+    component count and largest component after every merge, and each threshold
+    reads the state after the merges it admits. Pairs below the lowest threshold
+    are dropped up front. This replaces building and analysing a separate graph
+    per threshold.
+    """
+    thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+    team_count = overlap.shape[0]
+    pair_count = team_count * (team_count - 1) // 2
+    # Pairs with no overlap only become edges at thresholds of 0 and below,
+    # those thresholds give a complete graph and need no pair weights
+    includes_zero = (thresholds < 0) if strict else (thresholds <= 0)
+    minimum = thresholds[~includes_zero].min() if (~includes_zero).any() else np.inf
+    weights = _pair_weights(overlap, minimum, strict)
+    values = np.sort(weights.data)
+    edge_count = np.where(includes_zero, pair_count, _count_at_least(values, thresholds, strict))
+
+    symmetric = weights + weights.T
+    strongest = np.zeros(team_count)
+    if symmetric.nnz:
+        strongest = symmetric.max(axis=1).toarray().ravel()
+    isolated = np.where(includes_zero, 0 if team_count > 1 else team_count,
+                        team_count - _count_at_least(np.sort(strongest), thresholds, strict))
+
+    # Maximum spanning forest: minimum spanning tree of the weights' ranks
+    # reversed, which are exact integers where arithmetic on the float weights
+    # could round distinct weights together. The forest edges' real weights
+    # are then read back from the weight matrix.
+    forest_weights = np.empty(0)
+    merges_components = np.array([team_count])
+    merges_largest = np.array([min(team_count, 1)])
+    if weights.nnz:
+        distinct = np.unique(values)
+        reversed_ranks = weights.copy()
+        reversed_ranks.data = (len(distinct) - np.searchsorted(distinct, weights.data)).astype(np.float64)
+        forest = minimum_spanning_tree(reversed_ranks).tocoo()
+        edge_weights = np.asarray(symmetric[forest.row, forest.col]).ravel()
+        order = np.argsort(-edge_weights, kind="stable")
+        forest_weights = edge_weights[order]
+        merges_components, merges_largest = _merge_sizes(team_count, forest.row[order], forest.col[order])
+
+    merges = _count_at_least(forest_weights[::-1], thresholds, strict)
+    components = np.where(includes_zero, min(team_count, 1), merges_components[merges])
+    largest = np.where(includes_zero, team_count, merges_largest[merges])
+    return ThresholdSweep(thresholds, edge_count.astype(np.int64), components.astype(np.int64),
+                          largest.astype(np.int64), isolated.astype(np.int64))
+
+
+def _merge_sizes(team_count, rows, columns):
+    # Union-find over the forest edges in order, entry k is the state after k merges
+    parent = list(range(team_count))
+    size = [1] * team_count
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    components = [team_count]
+    largest = [min(team_count, 1)]
+    for u, v in zip(rows.tolist(), columns.tolist()):
+        u, v = find(u), find(v)
+        if size[u] < size[v]:
+            u, v = v, u
+        parent[v] = u
+        size[u] += size[v]
+        components.append(components[-1] - 1)
+        largest.append(max(largest[-1], size[u]))
+    return np.array(components), np.array(largest)
@@ -0,0 +1,200 @@
+import time
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import maximum_bipartite_matching
+
+from allocator import OPTIMAL, AllocationResult, _check_finite, _infeasible, _pairs_array, solve_allocation
+from profiling import profiled
+from team_statistics import normalize_non_zero
+
+
+class FairAllocationResult(AllocationResult):
+    """``AllocationResult`` of the max-min allocator.
+
+    ``min_normalized`` is the bottleneck value reached, the smallest
+    normalized b value (b value over the team's largest b value) any
+    allocated team receives, and ``checks`` counts the matching feasibility
+    checks the binary search needed.
+    """
+
+    def __init__(self, assignment, objective, runtime, exitflag, status, min_normalized, checks):
+        super().__init__(assignment, objective, runtime, exitflag, status)
+        self.min_normalized = min_normalized
+        self.checks = checks
+
+    def __repr__(self):
+        return (f"FairAllocationResult(status={self.status}, min_normalized={self.min_normalized}, "
+                f"objective={self.objective}, runtime={self.runtime:.4f}s)")
+
+
+class _PlaceGraph(object):
+    # Every allowed (team, place) edge with its normalized b value in team
+    # order, so the graph of a threshold is a mask away from CSR form
+
+    def __init__(self, normalized, allowed, capacities):
+        team_count, project_count = normalized.shape
+        teams, projects = np.nonzero(allowed)
+
+        # One edge per place of the project, places of a project are consecutive
+        first_place = np.concatenate(([0], np.cumsum(capacities)))
+        repeats = capacities[projects]
+        entry = np.repeat(np.arange(len(projects)), repeats)
+        offset = np.arange(len(entry)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        self.teams = teams[entry]
+        self.places = (first_place[projects[entry]] + offset).astype(np.int32)
+        self.values = normalized[teams, projects][entry]
+        self.place_project = np.repeat(np.arange(project_count), capacities)
+        self.shape = (team_count, int(first_place[-1]))
+
+    def matching(self, threshold):
+        # Hopcroft-Karp maximum matching using only edges of value >= threshold,
+        # returns the place of every team or -1
+        keep = self.values >= threshold
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(self.teams[keep], minlength=self.shape[0]))))
+        graph = sparse.csr_matrix((np.ones(indptr[-1], dtype=np.int8),
+                                   self.places[keep], indptr), shape=self.shape)
+        return maximum_bipartite_matching(graph, perm_type="column")
+
+
+def _candidates(values, ceiling):
+    # Thresholds worth testing: the distinct edge values up to the ceiling and
+    # the ceiling itself, which is the answer whenever the teams reach it
+    candidates = np.unique(values[values <= ceiling])
+    if np.isfinite(ceiling):
+        candidates = np.union1d(candidates, [ceiling])
+    return candidates
+
+
+def _bottleneck(graph, target, candidates):
+    # Largest of the sorted ``candidates`` whose graph still matches ``target``
+    # teams, by binary search. Returns (threshold, matching, checks), the
+    # threshold is None when even the smallest candidate fails
+    low, high = 0, len(candidates) - 1
+    best = graph.matching(candidates[0])
+    checks = 1
+    if np.count_nonzero(best >= 0) < target:
+        return None, best, checks
+    while low < high:
+        middle = (low + high + 1) // 2
+        matching = graph.matching(candidates[middle])
+        checks += 1
+        if np.count_nonzero(matching >= 0) >= target:
+            low, best = middle, matching
+        else:
+            high = middle - 1
+    return candidates[low], best, checks
+
+
+@profiled("fair_allocate")
+def solve_fair_allocation(b_values, forced=(), forbidden=(), capacities=None, allow_unassigned=False,
+                          tie_break=True):
+    """Allocation maximising the smallest normalized b value any team receives.
+
+    A team's normalized b value for a project is its b value divided by the
+    team's largest b value, so every team's best project scores 1. The
+    bottleneck value is found by binary search over the sorted distinct
+    normalized values: a value is reachable when the teams can still all be
+    matched using only pairs at or above it, checked with Hopcroft-Karp
+    maximum bipartite matching (projects repeated once per place). That needs
+    ``log2(distinct values)`` matchings instead of an LP per threshold.
+
+    With ``tie_break`` the allocations reaching the bottleneck are then
+    compared on total b value, by solving the optimal assignment restricted
+    to pairs at or above it, otherwise the last matching found is returned
+    as is. ``forced``, ``forbidden`` and ``capacities`` are as in
+    ``solve_allocation``, and so is the ValueError for non-finite b values.
+    With ``allow_unassigned`` the bottleneck is over the allocated teams of a
+    maximum size allocation, teams are only left out when the places or
+    allowed pairs cannot cover them.
+    """
+    start = time.perf_counter()
+    b_values = np.asarray(b_values, dtype=np.float64)
+    team_count, project_count = b_values.shape
+    # A NaN team would otherwise lose every edge in the place graphs
+    _check_finite(b_values)
+
+    if capacities is None:
+        capacities = np.ones(project_count, dtype=np.intp)
+    capacities = np.asarray(capacities, dtype=np.intp)
+    if capacities.shape != (project_count,) or np.any(capacities < 0):
+        raise ValueError("capacities must hold one non-negative count per project")
+
+    forced_teams, forced_projects = _pairs_array(forced)
+    forbidden_teams, forbidden_projects = _pairs_array(forbidden)
+    allowed = np.ones((team_count, project_count), dtype=bool)
+    allowed[forbidden_teams, forbidden_projects] = False
+    if len(np.unique(forced_teams)) != len(forced_teams):
+        return _infeasible(team_count, start, "team forced to more than one project")
+    if not np.all(allowed[forced_teams, forced_projects]):
+        return _infeasible(team_count, start, "pair both forced and forbidden")
+    remaining = capacities - np.bincount(forced_projects, minlength=project_count)
+    if np.any(remaining < 0):
+        return _infeasible(team_count, start, "forced pairs exceed project capacity")
+
+    normalized = normalize_non_zero(b_values)[0]
+    assignment = np.full(team_count, -1, dtype=np.intp)
+    assignment[forced_teams] = forced_projects
+    # Forced teams hold their places, the search is over the free teams and the
+    # bottleneck can be no higher than the worst forced pair
+    free_teams = np.flatnonzero(assignment < 0)
+    ceiling = normalized[forced_teams, forced_projects].min() if len(forced_teams) else np.inf
+    free_normalized, free_allowed = normalized[free_teams], allowed[free_teams]
+
+    # Pairs with a zero b value only matter when the bottleneck is 0, so the
+    # search runs on the much smaller graph of positive pairs first
+    graph = _PlaceGraph(free_normalized, free_allowed & (free_normalized > 0), remaining)
+    full = _PlaceGraph(free_normalized, free_allowed, remaining) if allow_unassigned else None
+    if allow_unassigned:
+        target = np.count_nonzero(full.matching(-np.inf) >= 0) if len(full.values) else 0
+    else:
+        target = len(free_teams)
+
+    threshold, matching, checks = None, np.full(len(free_teams), -1, dtype=np.intp), 0
+    if target == 0:
+        threshold = ceiling
+    else:
+        candidates = _candidates(graph.values, ceiling)
+        if not allow_unassigned and len(candidates):
+            # No team can do better than its best allowed project, edges are
+            # in team order so every team's edges are one run
+            counts = np.bincount(graph.teams, minlength=len(free_teams))
+            if np.all(counts):
+                starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+                candidates = candidates[candidates <= np.maximum.reduceat(graph.values, starts).min()]
+            else:
+                candidates = candidates[:0]
+        if len(candidates):
+            threshold, matching, checks = _bottleneck(graph, target, candidates)
+        if threshold is None:
+            if full is None:
+                full = _PlaceGraph(free_normalized, free_allowed, remaining)
+            candidates = _candidates(full.values, min(0, ceiling))
+            if len(candidates):
+                threshold, matching, more = _bottleneck(full, target, candidates)
+                checks += more
+            graph = full
+    if threshold is None:
+        return _infeasible(team_count, start, "not enough project places for every team")
+
+    if tie_break and target:
+        # Best total b value among allocations that keep every allocated team
+        # at or above the bottleneck. With allow_unassigned every allocated
+        # team is worth a constant extra, so no team is dropped for the total.
+        rows, below = np.nonzero(free_allowed & (free_normalized < threshold))
+        excluded = np.vstack((np.column_stack((free_teams[rows], below)),
+                              np.column_stack((forbidden_teams, forbidden_projects))))
+        bonus = np.abs(b_values).sum() + 1 if allow_unassigned else 0.0
+        result = solve_allocation(b_values + bonus, forced, excluded, capacities, allow_unassigned)
+        if not result.feasible:
+            return _infeasible(team_count, start, result.status)
+        assignment = result.assignment
+    else:
+        matched = matching >= 0
+        assignment[free_teams[matched]] = graph.place_project[matching[matched]]
+
+    teams = np.flatnonzero(assignment >= 0)
+    objective = float(b_values[teams, assignment[teams]].sum())
+    reached = float(normalized[teams, assignment[teams]].min()) if len(teams) else np.nan
+    return FairAllocationResult(assignment, objective, time.perf_counter() - start, OPTIMAL,
+                                "max-min optimal", reached, checks)
@@ -0,0 +1,207 @@
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from allocator import INFEASIBLE, OPTIMAL, AllocationResult
+
+
+class IncrementalAllocator(object):
+    """Optimal allocation that is repaired in place after every coordinator edit.
+
+    The problem is held as a square assignment problem: every project is
+    repeated once per place (``capacities``), dummy teams with zero cost fill
+    the spare places and, with ``allow_unassigned``, a zero valued dummy place
+    per team lets teams go unallocated. Alongside the matching the allocator
+    keeps the dual potentials ``u`` (teams) and ``v`` (places) of the optimal
+    solution.
+
+    Forcing or forbidding a pair, releasing it again or replacing a team's b
+    values only changes that team's row of costs, so the team is unmatched and
+    re-inserted with a single shortest augmenting path over the reduced costs
+    instead of solving the whole problem again. An edit that cannot be
+    satisfied is rolled back and reported with an infeasible result.
+    """
+
+    def __init__(self, b_values, capacities=None, allow_unassigned=False):
+        start = time.perf_counter()
+        self.b_values = np.array(b_values, dtype=np.float64)
+        team_count, project_count = self.b_values.shape
+
+        if capacities is None:
+            capacities = np.ones(project_count, dtype=np.intp)
+        capacities = np.asarray(capacities, dtype=np.intp)
+        if capacities.shape != (project_count,) or np.any(capacities < 0):
+            raise ValueError("capacities must hold one non-negative count per project")
+
+        # Project of every place, -1 for the places that mean "unallocated"
+        self.place_project = np.repeat(np.arange(project_count), capacities)
+        if allow_unassigned:
+            self.place_project = np.concatenate(
+                (self.place_project, np.full(team_count, -1, dtype=np.intp)))
+        if len(self.place_project) < team_count:
+            raise ValueError("Not enough project places for every team")
+
+        self.team_count = team_count
+        self.size = len(self.place_project)
+        self.forced = {}
+        self.forbidden = set()
+
+        self.cost = np.zeros((self.size, self.size))
+        self.cost[:team_count] = self._base_cost(np.arange(team_count))
+
+        rows, columns = linear_sum_assignment(self.cost)
+        self.col4row = np.empty(self.size, dtype=np.intp)
+        self.row4col = np.empty(self.size, dtype=np.intp)
+        self.col4row[rows] = columns
+        self.row4col[columns] = rows
+        self.u, self.v = self._potentials()
+        self.last_runtime = time.perf_counter() - start
+
+    def _base_cost(self, teams):
+        real = self.place_project >= 0
+        cost = np.zeros((len(teams), self.size))
+        cost[:, real] = -self.b_values[np.ix_(teams, self.place_project[real])]
+        return cost
+
+    def _row_cost(self, team):
+        cost = self._base_cost([team])[0]
+        forbidden = [project for t, project in self.forbidden if t == team]
+        cost[np.isin(self.place_project, forbidden)] = np.inf
+        if team in self.forced:
+            cost[self.place_project != self.forced[team]] = np.inf
+        return cost
+
+    def _potentials(self):
+        # Dual potentials of an optimal matching: v is the shortest path distance
+        # to every place in the residual graph, found with vectorised
+        # Bellman-Ford relaxations, and u follows from the tight matched edges
+        matched = self.cost[self.row4col, np.arange(self.size)]
+        weights = self.cost[self.row4col] - matched[:, None]
+        v = np.zeros(self.size)
+        for _ in range(self.size):
+            relaxed = np.minimum(v, (v[:, None] + weights).min(axis=0))
+            if np.array_equal(relaxed, v):
+                break
+            v = relaxed
+        u = self.cost[np.arange(self.size), self.col4row] - v[self.col4row]
+        return u, v
+
+    def _augment(self, row):
+        # Shortest augmenting path from a free row to the free place, as in the
+        # Jonker-Volgenant/Crouse algorithm. Only modifies the state on success.
+        shortest = np.full(self.size, np.inf)
+        path = np.full(self.size, -1, dtype=np.intp)
+        scanned = np.zeros(self.size, dtype=bool)
+        scanned_rows = []
+        min_value = 0.0
+        i = row
+        while True:
+            scanned_rows.append(i)
+            reduced = min_value + self.cost[i] - self.u[i] - self.v
+            better = ~scanned & (reduced < shortest)
+            path[better] = i
+            shortest[better] = reduced[better]
+
+            candidates = np.where(scanned, np.inf, shortest)
+            j = int(np.argmin(candidates))
+            min_value = candidates[j]
+            if not np.isfinite(min_value):
+                return False
+            scanned[j] = True
+            if self.row4col[j] < 0:
+                sink = j
+                break
+            i = self.row4col[j]
+
+        self.u[row] += min_value
+        for i in scanned_rows[1:]:
+            self.u[i] += min_value - shortest[self.col4row[i]]
+        self.v[scanned] -= min_value - shortest[scanned]
+
+        j = sink
+        while True:
+            i = path[j]
+            self.row4col[j] = i
+            self.col4row[i], j = j, self.col4row[i]
+            if i == row:
+                break
+        return True
+
+    def _resolve_team(self, team, undo):
+        start = time.perf_counter()
+        place, old_u, old_cost = self.col4row[team], self.u[team], self.cost[team].copy()
+        self.row4col[place] = -1
+        self.col4row[team] = -1
+        self.cost[team] = self._row_cost(team)
+        self.u[team] = 0
+
+        if self._augment(team):
+            self.last_runtime = time.perf_counter() - start
+            return self.result()
+
+        # Put back the previous constraints and matching, the duals are untouched
+        undo()
+        self.cost[team] = old_cost
+        self.u[team] = old_u
+        self.col4row[team] = place
+        self.row4col[place] = team
+        self.last_runtime = time.perf_counter() - start
+        return AllocationResult(np.full(self.team_count, -1, dtype=np.intp), np.nan,
+                                self.last_runtime, INFEASIBLE, "edit cannot be satisfied")
+
+    def force(self, team, project):
+        # Pins team to project (a P pair in get_allocations.m)
+        previous = self.forced.get(team)
+        self.forced[team] = project
+
+        def undo():
+            if previous is None:
+                del self.forced[team]
+            else:
+                self.forced[team] = previous
+        return self._resolve_team(team, undo)
+
+    def forbid(self, team, project):
+        # Prevents team from being given project (a Q pair in get_allocations.m)
+        added = (team, project) not in self.forbidden
+        self.forbidden.add((team, project))
+
+        def undo():
+            if added:
+                self.forbidden.discard((team, project))
+        return self._resolve_team(team, undo)
+
+    def release(self, team, project):
+        # Removes any pin or ban on the pair
+        was_forced = self.forced.get(team) == project
+        was_forbidden = (team, project) in self.forbidden
+        if was_forced:
+            del self.forced[team]
+        self.forbidden.discard((team, project))
+
+        def undo():
+            if was_forced:
+                self.forced[team] = project
+            if was_forbidden:
+                self.forbidden.add((team, project))
+        return self._resolve_team(team, undo)
+
+    def update_team(self, team, b_values):
+        # Replaces one team's row of b values, e.g. after a preference change
+        previous = self.b_values[team].copy()
+        self.b_values[team] = b_values
+
+        def undo():
+            self.b_values[team] = previous
+        return self._resolve_team(team, undo)
+
+    @property
+    def assignment(self):
+        return self.place_project[self.col4row[:self.team_count]]
+
+    def result(self):
+        assignment = self.assignment
+        teams = np.flatnonzero(assignment >= 0)
+        objective = float(self.b_values[teams, assignment[teams]].sum())
+        return AllocationResult(assignment.copy(), objective, self.last_runtime, OPTIMAL, "optimal")
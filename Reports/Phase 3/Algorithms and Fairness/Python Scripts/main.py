@@ -1,86 +1,43 @@
+import sys
+
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 from matplotlib.widgets import Slider, Button
 
-impact_dataframe = pd.read_excel(
-    "IFB398 24se1 Project Allocation.xlsx", sheet_name="impact")
-capability_dataframe = pd.read_excel(
-    "IFB398 24se1 Project Allocation.xlsx", sheet_name="fit")
-preference_dataframe = pd.read_excel(
-    "IFB398 24se1 Project Allocation.xlsx", sheet_name="pref")
+from allocation_data import load_allocation_data
+from pipeline_cache import PipelineCache
+from profiling import profile_from_environment
+from team_scatter import BlitManager, TeamScatter, render_scalars
+
+profile_from_environment()
+allocation_data = load_allocation_data("IFB398 24se1 Project Allocation.xlsx")
 
-team_names = impact_dataframe.iloc[1:, 0].values
-project_names = impact_dataframe.columns[2:]
+team_names = allocation_data.team_names
+project_names = allocation_data.project_names
 
 
-impact_data = impact_dataframe.iloc[1:, 2:].to_numpy()
-capability_data = capability_dataframe.iloc[1:, 2:].to_numpy()
-preference_data = preference_dataframe.iloc[1:, 2:].to_numpy()
+impact_data = allocation_data.impact
+capability_data = allocation_data.capability
+preference_data = allocation_data.preference
 
 
 preference_scalar = 0.1
 sort_by_lambda = False
 
 
-def calculate_b_values(impact, capability, preference, pref_scalar):
-    return impact * (capability + pref_scalar * preference)
-
-
-def plot_team_scatter(msum):
-    ax.clear()
-
-    lambdas = np.zeros(shape=(len(team_names), 1))
-    team_max_values = [max(msum[i, :][np.nonzero(msum[i, :])])
-                       for i in range(len(team_names))]
-
-    for i in range(len(team_names)):
-        team_b_values = msum[i, :]
-        non_zero_projects = np.nonzero(team_b_values)[0]
-        non_zero_values = team_b_values[non_zero_projects]
-        if len(non_zero_values) > 0:
-            non_zero_values = non_zero_values / max(non_zero_values)
-            sd = np.std(non_zero_values)
-            lambda_value = sd / len(non_zero_values)
-            lambdas[i] = lambda_value
+# b values, their normalization and sigma are memoized per preference scalar,
+# so re-sorting or returning to an earlier slider position recomputes nothing
+pipeline = PipelineCache()
 
-    if sort_by_lambda:
-        sorted_teams_indices = np.argsort(lambdas.flatten())[::-1]
-    else:
-        sorted_teams_indices = np.argsort(team_max_values)[::-1]
 
-    sorted_team_names = [team_names[i] for i in sorted_teams_indices]
-
-    for sorted_i, i in enumerate(sorted_teams_indices):
-        team_b_values = msum[i, :]
-        non_zero_projects = np.nonzero(team_b_values)[0]
-        non_zero_values = team_b_values[non_zero_projects]
-        if len(non_zero_values) > 0:
-            non_zero_values = non_zero_values / max(non_zero_values)
-            ax.scatter(non_zero_values, [sorted_i] * len(non_zero_values),
-                       c=non_zero_projects, cmap='viridis', s=5, label=sorted_team_names[sorted_i])
-
-    if not hasattr(ax, 'ax2'):
-        ax.ax2 = ax.twinx()
-    ax.ax2.set_ylabel('Sigma (Urgency Coefficient)')
-    ax.ax2.set_yticks(np.arange(len(sorted_team_names)))
-    ax.ax2.set_yticklabels(
-        np.around(lambdas[sorted_teams_indices], decimals=3))
-
-    ax.set_yticks(np.arange(len(sorted_team_names)))
-    ax.set_yticklabels(sorted_team_names)
-    ax.set_xlabel('B Values')
-    ax.set_ylabel('Teams')
-    ax.set_title('Scatter Plot of Non-Zero B Values by Team')
-    plt.draw()
+def plot_team_scatter():
+    scatter.set_statistics(pipeline.statistics(allocation_data, preference_scalar), sort_by_lambda)
 
 
 def update(val):
     global preference_scalar
     preference_scalar = val
-    matrix_sum = calculate_b_values(
-        impact_data, capability_data, preference_data, preference_scalar)
-    plot_team_scatter(matrix_sum)
+    plot_team_scatter()
 
 
 def toggle_sorting(_):
@@ -88,10 +45,21 @@ def toggle_sorting(_):
     sort_by_lambda = not sort_by_lambda
     button.label.set_text(
         'Sorting by Sigma' if sort_by_lambda else 'Sorting by Max B Value')
-    matrix_sum = calculate_b_values(
-        impact_data, capability_data, preference_data, preference_scalar)
-    plot_team_scatter(matrix_sum)
-
+    plot_team_scatter()
+
+
+if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+    # Headless: python main.py --batch 0.1 0.2 0.5 [--output directory]
+    arguments = sys.argv[2:]
+    output = "team_scatter"
+    if "--output" in arguments:
+        position = arguments.index("--output")
+        output = arguments[position + 1]
+        del arguments[position:position + 2]
+    scalars = [float(value) for value in arguments] or list(np.linspace(0.01, 1.0, 100))
+    for filename in render_scalars(allocation_data, scalars, output):
+        print(filename)
+    sys.exit(0)
 
 # Create figure and axis
 # Adjust figure size to allow more space for scatter plot
@@ -99,19 +67,26 @@ fig, ax = plt.subplots(figsize=(10, 8))
 # Adjust bottom to make more space for controls
 plt.subplots_adjust(left=0.1, right=0.9, top=0.95, bottom=0.2)
 
-matrix_sum = calculate_b_values(
-    impact_data, capability_data, preference_data, preference_scalar)
-plot_team_scatter(matrix_sum)
+# The points and labels are redrawn by blitting, everything else is cached
+blit_manager = BlitManager(fig.canvas)
+scatter = TeamScatter(ax, team_names, len(project_names), blit_manager)
 
 ax_slider = plt.axes([0.1, 0.08, 0.45, 0.03],
                      facecolor='lightgoldenrodyellow')
 slider = Slider(ax_slider, 'Preference Scalar',
                 0.01, 1.0, valinit=preference_scalar)
+# The slider would otherwise redraw the whole figure on every move, its axes
+# (bar, handle and value text) are blitted with the scatter instead
+slider.drawon = False
+blit_manager.add_artist(ax_slider)
 slider.on_changed(update)
 
 ax_button = plt.axes([0.6, 0.08, 0.3, 0.04])
 button = Button(ax_button, 'Sorting by Max B Value')
+blit_manager.add_artist(button.label)
 button.on_clicked(toggle_sorting)
 
+plot_team_scatter()
+
 # Display the plot
 plt.show()
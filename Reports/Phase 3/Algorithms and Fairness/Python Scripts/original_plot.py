@@ -1,20 +1,17 @@
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 
-impact_dataframe = pd.read_excel(
-    "IFB398 24se1 Project Allocation.xlsx", sheet_name="impact")
-capability_dataframe = pd.read_excel(
-    "IFB398 24se1 Project Allocation.xlsx", sheet_name="fit")
-preference_dataframe = pd.read_excel(
-    "IFB398 24se1 Project Allocation.xlsx", sheet_name="pref")
+from allocation_data import load_allocation_data
+from team_statistics import team_statistics
 
-team_names = impact_dataframe.iloc[1:, 0].values
-project_names = impact_dataframe.columns[2:]
+allocation_data = load_allocation_data("IFB398 24se1 Project Allocation.xlsx")
 
-impact_data = impact_dataframe.iloc[1:, 2:].to_numpy()
-capability_data = capability_dataframe.iloc[1:, 2:].to_numpy()
-preference_data = preference_dataframe.iloc[1:, 2:].to_numpy()
+team_names = allocation_data.team_names
+project_names = allocation_data.project_names
+
+impact_data = allocation_data.impact
+capability_data = allocation_data.capability
+preference_data = allocation_data.preference
 
 
 def calculate_b_values(impact, capability, preference):
@@ -25,22 +22,15 @@ def calculate_b_values(impact, capability, preference):
 def plot_team_scatter(msum):
     ax.clear()
 
-    # Get the max non-zero values for sorting
-    team_max_values = [max(msum[i, :][np.nonzero(msum[i, :])])
-                       for i in range(len(team_names))]
-
-    # Sort teams by the maximum `b` value
-    sorted_teams_indices = np.argsort(team_max_values)[::-1]
+    # Sort teams by the maximum `b` value, teams without non-zero b values last
+    statistics = team_statistics(msum)
+    sorted_teams_indices = statistics.by_max_b
     sorted_team_names = [team_names[i] for i in sorted_teams_indices]
 
-    # Plot the scatter for each team, sorted by max `b` value
-    for sorted_i, i in enumerate(sorted_teams_indices):
-        team_b_values = msum[i, :]
-        non_zero_projects = np.nonzero(team_b_values)[0]
-        non_zero_values = team_b_values[non_zero_projects]
-        if len(non_zero_values) > 0:
-            ax.scatter(non_zero_values, [sorted_i] * len(non_zero_values),
-                       c=non_zero_projects, cmap='viridis', s=5, label=sorted_team_names[sorted_i])
+    # Every team's non-zero b values in one scatter, one row per team
+    rows, non_zero_projects, _ = statistics.non_zero(sorted_teams_indices)
+    non_zero_values = msum[sorted_teams_indices[rows], non_zero_projects]
+    ax.scatter(non_zero_values, rows, c=non_zero_projects, cmap='viridis', s=5)
 
     ax.set_yticks(np.arange(len(sorted_team_names)))
     ax.set_yticklabels(sorted_team_names)
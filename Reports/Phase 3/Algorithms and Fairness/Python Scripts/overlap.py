@@ -0,0 +1,272 @@
+import numpy as np
+
+import sparse_support
+from profiling import profiled
+
+
+def normalize_b_values(b_values):
+    # Divides every team's row by its maximum b value, all zero rows become NaN
+    # exactly like the per-team ``b / np.max(b)`` in the original scripts.
+    # Sparse b values give a CSR matrix, their empty rows simply stay empty
+    if sparse_support.issparse(b_values):
+        from team_statistics import normalize_non_zero
+
+        return normalize_non_zero(b_values)[0]
+    b_values = np.asarray(b_values, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return b_values / b_values.max(axis=1, keepdims=True)
+
+
+class TopProjects(object):
+    """Ragged per-team lists of project ids in CSR layout.
+
+    The projects of team i are ``indices[offsets[i]:offsets[i + 1]]``, best
+    ranked first, and ``project_count`` is the number of columns they index
+    into. Overlap and contention functions accept it in place of a boolean
+    teams x projects indicator.
+    """
+
+    def __init__(self, indices, offsets, project_count):
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.offsets = np.asarray(offsets, dtype=np.intp)
+        self.project_count = project_count
+
+    @classmethod
+    def from_indicator(cls, indicator):
+        indicator = np.asarray(indicator, dtype=bool)
+        rows, columns = np.nonzero(indicator)
+        offsets = np.concatenate(([0], np.cumsum(indicator.sum(axis=1))))
+        return cls(columns, offsets, indicator.shape[1])
+
+    @property
+    def team_count(self):
+        return len(self.offsets) - 1
+
+    @property
+    def shape(self):
+        return (self.team_count, self.project_count)
+
+    def __len__(self):
+        return self.team_count
+
+    def __getitem__(self, team):
+        return self.indices[self.offsets[team]:self.offsets[team + 1]]
+
+    def arrays(self):
+        return (self.indices, self.offsets)
+
+    def sizes(self):
+        return np.diff(self.offsets)
+
+    def rows(self):
+        # Team of every entry of ``indices``
+        return np.repeat(np.arange(self.team_count), self.sizes())
+
+    def to_indicator(self):
+        indicator = np.zeros(self.shape, dtype=bool)
+        indicator[self.rows(), self.indices] = True
+        return indicator
+
+    def to_csr(self, dtype=np.int32):
+        from scipy import sparse
+
+        return sparse.csr_matrix((np.ones(len(self.indices), dtype=dtype), self.indices, self.offsets),
+                                 shape=self.shape)
+
+    def __repr__(self):
+        return f"TopProjects(teams={self.team_count}, projects={self.project_count}, entries={len(self.indices)})"
+
+
+@profiled("top_k")
+def top_fraction(b_values, divisor=2, positional=False, normalized=None, ranked=False):
+    """Every team's top ranked projects as a ``TopProjects``.
+
+    A team keeps ``len(non_zero) // divisor`` of its non-zero projects, ``2``
+    for the top 50% used in graph_theory2/3 and ``5`` in graph_theory.py.
+    Projects are ranked by ``team_statistics.descending_order``: equal values
+    rank the higher project id first, so tied teams always get the same
+    selection. The original scripts' unstable ``np.argsort(...)[::-1]`` could
+    pick any of the tied projects, their figures can differ on tied b values.
+
+    Rather than sorting every row, ``np.partition`` finds each row's largest
+    candidate values and the value at the kept boundary decides the rest. Each
+    team's ids are in ascending order, or best first with ``ranked``.
+
+    The ids are real project ids. With ``positional`` they are positions within
+    each team's non-zero projects instead, the indices of the original
+    ``get_top_50_percent_indices``, which are only there for the
+    graph_theory2/3 figures.
+
+    ``normalized`` can be passed when the normalized b values are already
+    known, from ``normalize_b_values`` or ``team_statistics.normalize_non_zero``
+    (only the positive entries matter, so both give the same result).
+    """
+    if normalized is None:
+        normalized = normalize_b_values(b_values)
+    if sparse_support.issparse(normalized):
+        return _sparse_top_fraction(normalized, divisor, positional, ranked)
+    team_count, project_count = normalized.shape
+
+    candidates = normalized > 0
+    keep = candidates.sum(axis=1) // divisor
+    offsets = np.concatenate(([0], np.cumsum(keep)))
+    largest = int(keep.max()) if team_count else 0
+    if largest == 0:
+        return TopProjects(np.empty(0, dtype=np.intp), offsets, project_count)
+
+    # The ``largest`` biggest values of every row in ascending order, the kept
+    # boundary of row i is its keep[i]-th biggest value
+    scores = np.where(candidates, normalized, -np.inf)
+    head = np.sort(np.partition(scores, project_count - largest, axis=1)[:, project_count - largest:], axis=1)
+    boundary = head[np.arange(team_count), np.minimum(largest - keep, largest - 1)]
+    boundary[keep == 0] = np.inf
+
+    # Everything above the boundary is kept, of the projects tied at it only
+    # the highest ids that are still needed
+    selected = scores > boundary[:, None]
+    needed = keep - selected.sum(axis=1)
+    tied_rows, tied_columns = np.nonzero(scores == boundary[:, None])
+    tied_counts = np.bincount(tied_rows, minlength=team_count)
+    position = np.arange(len(tied_rows)) - (np.cumsum(tied_counts) - tied_counts)[tied_rows]
+    kept = tied_counts[tied_rows] - position <= needed[tied_rows]
+    selected[tied_rows[kept], tied_columns[kept]] = True
+
+    rows, columns = np.nonzero(selected)
+    if ranked:
+        # Stable sort of the reversed entries, so equal values keep higher ids first
+        rows, columns = rows[::-1], columns[::-1]
+        order = np.lexsort((-scores[rows, columns], rows))
+        columns = columns[order]
+        rows = rows[order]
+    if positional:
+        columns = (np.cumsum(candidates, axis=1) - 1)[rows, columns]
+    return TopProjects(columns, offsets, project_count)
+
+
+def _sparse_top_fraction(normalized, divisor, positional, ranked):
+    # top_fraction on CSR normalized b values, ranking only the stored entries
+    normalized = sparse_support.as_csr(normalized)
+    team_count, project_count = normalized.shape
+    rows, columns, values = sparse_support.row_ids(normalized), normalized.indices, normalized.data
+
+    candidates = values > 0
+    keep = np.bincount(rows[candidates], minlength=team_count) // divisor
+    offsets = np.concatenate(([0], np.cumsum(keep)))
+
+    # Best first within every row, equal values with the higher project id first
+    entries = np.flatnonzero(candidates)
+    order = entries[np.lexsort((-columns[entries], -values[entries], rows[entries]))]
+    starts = np.concatenate(([0], np.cumsum(np.bincount(rows[order], minlength=team_count))))
+    rank = np.arange(len(order)) - starts[rows[order]]
+    chosen = order[rank < keep[rows[order]]]
+    if not ranked:
+        chosen = np.sort(chosen)
+
+    selected = columns[chosen]
+    if positional:
+        # Position of each entry among its row's candidates, entries are in column order
+        candidate_rank = np.cumsum(candidates) - 1
+        first = np.concatenate(([0], np.cumsum(np.bincount(rows[candidates], minlength=team_count))))
+        selected = candidate_rank[chosen] - first[rows[chosen]]
+    return TopProjects(selected, offsets, project_count)
+
+
+def top_fraction_indicator(b_values, divisor=2, positional=False, normalized=None):
+    # Boolean teams x projects form of ``top_fraction``
+    return top_fraction(b_values, divisor, positional, normalized).to_indicator()
+
+
+@profiled("support")
+def support_indicator(b_values):
+    # Projects with a non-zero normalized b value, NaN rows count as non-zero
+    # the same way np.nonzero treated them in graph_theory.py
+    if sparse_support.issparse(b_values):
+        from scipy import sparse
+
+        support = sparse_support.as_csr(b_values).astype(bool)
+        empty = np.flatnonzero(sparse_support.row_counts(support) == 0)
+        if len(empty):
+            # Teams without b values support every project, as in the dense path
+            project_count = support.shape[1]
+            support = support + sparse.csr_matrix(
+                (np.ones(len(empty) * project_count, dtype=bool),
+                 (np.repeat(empty, project_count), np.tile(np.arange(project_count), len(empty)))),
+                shape=support.shape)
+        return support
+    return normalize_b_values(b_values) != 0
+
+
+@profiled("overlap")
+def overlap_percentages(top, other=None, backend="dense"):
+    """Percentage of each team's ``top`` projects that another team also has.
+
+    Entry ``[i, j]`` is ``|top[i] & other[j]| / |top[i]| * 100``, with ``other``
+    defaulting to ``top``. Teams without any top projects and the diagonal are
+    0, matching the guards in the original pairwise loops.
+
+    ``top`` and ``other`` are boolean teams x projects indicators or
+    ``TopProjects``. The intersections for all pairs come from a single
+    ``top @ other.T`` product. ``backend="sparse"`` does the product with SciPy
+    sparse matrices and returns a CSR matrix holding only the non-zero
+    overlaps, which is much smaller when most b values are zero.
+    """
+    other = top if other is None else other
+    if backend == "dense":
+        return _dense_overlap(_as_indicator(top), _as_indicator(other))
+    if backend == "sparse":
+        return _sparse_overlap(top, other)
+    raise ValueError(f"Unknown overlap backend '{backend}', expected 'dense' or 'sparse'")
+
+
+def _as_indicator(top):
+    if isinstance(top, TopProjects):
+        return top.to_indicator()
+    if sparse_support.issparse(top):
+        return top.toarray().astype(bool)
+    return np.asarray(top, dtype=bool)
+
+
+def _dense_overlap(top, other):
+    # float32 products are exact for counts up to 2**24 projects
+    counts = (top.astype(np.float32) @ other.T.astype(np.float32)).astype(np.float64)
+    sizes = top.sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        overlap = counts / sizes[:, None] * 100
+    overlap[sizes == 0] = 0
+    if overlap.shape[0] == overlap.shape[1]:
+        np.fill_diagonal(overlap, 0)
+    return overlap
+
+
+def _sparse_overlap(top, other):
+    from scipy import sparse
+
+    # TopProjects already are CSR rows, no dense indicator is built
+    top = top.to_csr() if isinstance(top, TopProjects) else sparse.csr_matrix(top, dtype=np.int32)
+    other = other.to_csr() if isinstance(other, TopProjects) else sparse.csr_matrix(other, dtype=np.int32)
+
+    counts = (top @ other.T).tocsr()
+    if counts.shape[0] == counts.shape[1]:
+        counts = (counts - sparse.diags(counts.diagonal(), dtype=counts.dtype)).tocsr()
+    counts.eliminate_zeros()
+
+    # Rows without top projects have no stored intersections, so the guard is free
+    sizes = np.diff(top.indptr)
+    rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+    overlap = counts.astype(np.float64)
+    overlap.data = overlap.data / sizes[rows] * 100
+    return overlap
+
+
+def calculate_top_overlap(b_values_matrix, divisor=2, positional=False, backend="dense"):
+    # Overlap between every pair of teams' top projects (graph_theory2/3)
+    top = top_fraction(b_values_matrix, divisor, positional)
+    return overlap_percentages(top, backend=backend)
+
+
+def calculate_support_overlap(b_values_matrix, divisor=5, backend="dense"):
+    # Overlap between every team's top projects and the other teams' non-zero
+    # projects (graph_theory.py)
+    top = top_fraction(b_values_matrix, divisor)
+    return overlap_percentages(top, support_indicator(b_values_matrix), backend=backend)
@@ -0,0 +1,138 @@
+import hashlib
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+import sparse_support
+from b_values import calculate_b_values
+from contention import calculate_lambda, project_contention
+from overlap import TopProjects, overlap_percentages, top_fraction
+from team_statistics import TeamStatistics, normalize_non_zero, team_statistics
+
+
+def data_digest(data):
+    # Content hash of a cohort's three matrices, shapes and dtypes included
+    digest = hashlib.blake2b(digest_size=16)
+    for matrix in (data.impact, data.capability, data.preference):
+        if sparse_support.issparse(matrix):
+            # A sparse matrix hashes as its CSR arrays, so it never collides
+            # with the dense matrix of the same values
+            matrix = sparse_support.as_csr(matrix)
+            digest.update(f"csr{matrix.shape}".encode("ascii"))
+            parts = (matrix.data, matrix.indices, matrix.indptr)
+        else:
+            parts = (matrix,)
+        for part in parts:
+            part = np.ascontiguousarray(part)
+            digest.update(f"{part.dtype.str}{part.shape}".encode("ascii"))
+            digest.update(part.data)
+    return digest.hexdigest()
+
+
+def _freeze(value):
+    # Cached arrays are shared between callers, so they are made read-only
+    if isinstance(value, (TopProjects, TeamStatistics)):
+        value = value.arrays()
+    for array in (value if isinstance(value, tuple) else (value,)):
+        if sparse_support.issparse(array):
+            for part in (array.data, array.indices, array.indptr):
+                part.flags.writeable = False
+        elif isinstance(array, np.ndarray):
+            array.flags.writeable = False
+
+
+class PipelineCache(object):
+    """Memoized b value pipeline shared between plots and analyses.
+
+    Every stage is a node keyed on the content hash of the cohort and the
+    scalars it depends on::
+
+        b_values(pref_scalar, alpha)
+          -> normalized(pref_scalar, alpha) -> statistics(pref_scalar, alpha)
+          -> top(..., divisor, positional) -> overlap(..., backend)
+                                           -> contention(...)
+
+    A node computes its inputs through the cache, so asking for the overlap
+    and then the contention index of the same b values normalizes and ranks
+    them once, and changing ``divisor`` reuses the b values. The most recently
+    used ``maxsize`` results are kept.
+
+    Cached arrays are read-only. The matrices of a cohort are hashed once per
+    ``AllocationData`` object, call ``clear`` after modifying them in place.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._digests = weakref.WeakKeyDictionary()
+
+    def __len__(self):
+        return len(self._results)
+
+    def clear(self):
+        self._results.clear()
+        self._digests.clear()
+
+    def info(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self), "maxsize": self.maxsize}
+
+    def digest(self, data):
+        try:
+            return self._digests[data]
+        except KeyError:
+            digest = self._digests[data] = data_digest(data)
+            return digest
+
+    def _memo(self, key, compute):
+        try:
+            value = self._results[key]
+        except KeyError:
+            self.misses += 1
+            value = self._results[key] = compute()
+            _freeze(value)
+            if len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+            return value
+        self.hits += 1
+        self._results.move_to_end(key)
+        return value
+
+    def b_values(self, data, pref_scalar=0.1, alpha=1):
+        key = ("b_values", self.digest(data), float(pref_scalar), float(alpha))
+        return self._memo(key, lambda: calculate_b_values(
+            data.impact, data.capability, data.preference, pref_scalar, alpha))
+
+    def normalized(self, data, pref_scalar=0.1, alpha=1):
+        # (normalized b values, non-zero mask, row maxima), see normalize_non_zero
+        key = ("normalized", self.digest(data), float(pref_scalar), float(alpha))
+        return self._memo(key, lambda: normalize_non_zero(self.b_values(data, pref_scalar, alpha)))
+
+    def statistics(self, data, pref_scalar=0.1, alpha=1):
+        # TeamStatistics of the b values, sharing the normalized node's arrays
+        key = ("statistics", self.digest(data), float(pref_scalar), float(alpha))
+        return self._memo(key, lambda: team_statistics(
+            None, normalized=self.normalized(data, pref_scalar, alpha)))
+
+    def top(self, data, pref_scalar=0.1, alpha=1, divisor=2, positional=False):
+        # TopProjects of every team's top 1/divisor projects
+        key = ("top", self.digest(data), float(pref_scalar), float(alpha), divisor, positional)
+        return self._memo(key, lambda: top_fraction(
+            None, divisor, positional, normalized=self.normalized(data, pref_scalar, alpha)[0]))
+
+    def overlap(self, data, pref_scalar=0.1, alpha=1, divisor=2, positional=False, backend="dense"):
+        key = ("overlap", self.digest(data), float(pref_scalar), float(alpha), divisor, positional, backend)
+        return self._memo(key, lambda: overlap_percentages(
+            self.top(data, pref_scalar, alpha, divisor, positional), backend=backend))
+
+    def contention(self, data, pref_scalar=0.1, alpha=1, divisor=2, positional=False):
+        # (lambda per team, contention per project), see contention.contention_index
+        def compute():
+            top = self.top(data, pref_scalar, alpha, divisor, positional)
+            contention = project_contention(top)
+            return calculate_lambda(top, contention), contention
+
+        key = ("contention", self.digest(data), float(pref_scalar), float(alpha), divisor, positional)
+        return self._memo(key, compute)
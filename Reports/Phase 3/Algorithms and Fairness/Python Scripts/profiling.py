@@ -0,0 +1,372 @@
+import atexit
+import functools
+import json
+import os
+import runpy
+import sys
+import threading
+import time
+import tracemalloc
+
+# Setting ALLOCATION_PROFILE=trace.json profiles a run of an entry point that
+# calls profile_from_environment (main.py, batch_allocation.py) and writes the
+# trace when the interpreter exits, ALLOCATION_PROFILE_MEMORY=0 skips the
+# tracemalloc peaks
+PROFILE_ENV = "ALLOCATION_PROFILE"
+
+# The active Profiler, None while profiling is off
+_profiler = None
+
+
+def _nbytes(value):
+    # Bytes held by the arrays in a value: NumPy arrays, SciPy sparse matrices,
+    # objects with an ``arrays()`` method and tuples/lists of those
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if hasattr(value, "nnz") and hasattr(value, "data"):
+        return sum(getattr(value, part).nbytes for part in ("data", "indices", "indptr")
+                   if hasattr(value, part))
+    arrays = getattr(value, "arrays", None)
+    if callable(arrays):
+        return _nbytes(arrays())
+    return 0
+
+
+class StageStats(object):
+    """Totals of every call of one stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.self_seconds = 0.0
+        self.max_seconds = 0.0
+        self.peak_bytes = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.max_bytes_in = 0
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class _Frame(object):
+    __slots__ = ("name", "start", "children", "memory_start", "memory_peak", "bytes_in")
+
+    def __init__(self, name, start, bytes_in):
+        self.name = name
+        self.start = start
+        self.children = 0.0
+        self.memory_start = 0
+        self.memory_peak = 0
+        self.bytes_in = bytes_in
+
+
+class Profiler(object):
+    """Collects stage timings while it is the active profiler.
+
+    The pipeline functions (loading, b values, normalization, top-k, overlap,
+    lambda, allocation, plotting) are wrapped with ``profiled``. Inside
+    ``with profile() as profiler:`` every call records its wall time, self
+    time (minus nested stages), input and output array bytes and, with
+    tracemalloc, its allocation peak. While no profiler is active the wrappers
+    only check one global and call straight through, so they stay in place in
+    normal runs.
+
+    ``write`` dumps the per-stage totals together with Chrome trace events,
+    which chrome://tracing, Perfetto and speedscope show as a flame chart, and
+    ``write_folded`` writes folded stacks for flamegraph.pl.
+
+    ``trace_memory`` runs tracemalloc for the per-stage allocation peaks, which
+    slows allocation-heavy code down noticeably. At most ``max_events``
+    individual calls are kept for the trace, the per-stage totals count all.
+    Stages entered from other threads only count towards the totals and
+    worker processes (``scenarios.run_scenarios``) are not profiled.
+    """
+
+    def __init__(self, trace_memory=True, max_events=100000):
+        self.trace_memory = trace_memory
+        self.max_events = max_events
+        self.stages = {}
+        self.events = []
+        self.dropped_events = 0
+        self._stack = []
+        self._thread = threading.get_ident()
+        self._origin = time.perf_counter()
+        self._started_tracemalloc = False
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def stop(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _fold_peak(self):
+        # tracemalloc has a single peak, so it is folded into every open stage
+        # and reset before a nested stage starts measuring its own
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in self._stack:
+            frame.memory_peak = max(frame.memory_peak, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def enter(self, name, bytes_in=0):
+        frame = _Frame(name, time.perf_counter(), bytes_in)
+        if threading.get_ident() != self._thread:
+            return frame
+        if self.trace_memory and tracemalloc.is_tracing():
+            frame.memory_start = frame.memory_peak = self._fold_peak()
+        self._stack.append(frame)
+        return frame
+
+    def exit(self, frame, bytes_out=0):
+        end = time.perf_counter()
+        seconds = end - frame.start
+        nested = self._stack and self._stack[-1] is frame
+        peak_bytes = None
+        if nested:
+            if self.trace_memory and tracemalloc.is_tracing():
+                self._fold_peak()
+                peak_bytes = frame.memory_peak - frame.memory_start
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1].children += seconds
+
+        stats = self.stages.get(frame.name)
+        if stats is None:
+            stats = self.stages[frame.name] = StageStats(frame.name)
+        stats.calls += 1
+        stats.seconds += seconds
+        stats.self_seconds += seconds - frame.children
+        stats.max_seconds = max(stats.max_seconds, seconds)
+        stats.bytes_in += frame.bytes_in
+        stats.bytes_out += bytes_out
+        stats.max_bytes_in = max(stats.max_bytes_in, frame.bytes_in)
+        if peak_bytes is not None:
+            stats.peak_bytes = max(stats.peak_bytes or 0, peak_bytes)
+
+        if not nested:
+            return
+        if len(self.events) >= self.max_events:
+            self.dropped_events += 1
+            return
+        args = {"bytes_in": frame.bytes_in, "bytes_out": bytes_out}
+        if peak_bytes is not None:
+            args["peak_bytes"] = peak_bytes
+        self.events.append({
+            "name": frame.name, "ph": "X", "pid": os.getpid(), "tid": 0,
+            "ts": (frame.start - self._origin) * 1e6, "dur": seconds * 1e6,
+            "stack": tuple(open_frame.name for open_frame in self._stack) + (frame.name,),
+            "self": seconds - frame.children, "args": args,
+        })
+
+    def summary(self):
+        # Stages by total time, largest first
+        return sorted(self.stages.values(), key=lambda stats: stats.seconds, reverse=True)
+
+    def report(self):
+        lines = [f"{'stage':<20} {'calls':>7} {'total ms':>11} {'self ms':>11} {'max ms':>10} "
+                 f"{'peak MiB':>9} {'in MiB':>9}"]
+        for stats in self.summary():
+            peak = "" if stats.peak_bytes is None else f"{stats.peak_bytes / 2 ** 20:.2f}"
+            lines.append(f"{stats.name:<20} {stats.calls:>7} {stats.seconds * 1000:>11.2f} "
+                         f"{stats.self_seconds * 1000:>11.2f} {stats.max_seconds * 1000:>10.2f} "
+                         f"{peak:>9} {stats.max_bytes_in / 2 ** 20:>9.2f}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        # Chrome trace format, the extra "stages" key is ignored by trace viewers
+        events = [{key: value for key, value in event.items() if key not in ("stack", "self")}
+                  for event in self.events]
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "stages": {stats.name: stats.to_dict() for stats in self.summary()},
+            "dropped_events": self.dropped_events,
+        }
+
+    def write(self, path):
+        with open(path, "w") as handle:
+            json.dump(self.to_dict(), handle, indent=1)
+
+    def folded(self):
+        # "outer;inner microseconds" lines of self time, merged by stack
+        totals = {}
+        for event in self.events:
+            stack = ";".join(event["stack"])
+            totals[stack] = totals.get(stack, 0.0) + event["self"]
+        return [f"{stack} {max(int(round(seconds * 1e6)), 0)}" for stack, seconds in sorted(totals.items())]
+
+    def write_folded(self, path):
+        with open(path, "w") as handle:
+            handle.write("\n".join(self.folded()) + "\n")
+
+
+def enable(profiler=None):
+    # Makes ``profiler`` (a new one by default) the active profiler
+    global _profiler
+    if _profiler is not None:
+        raise RuntimeError("A profiler is already active")
+    _profiler = profiler or Profiler()
+    _profiler.start()
+    return _profiler
+
+
+def disable():
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+def active():
+    return _profiler
+
+
+class profile(object):
+    """``with profile() as profiler:`` profiles everything inside the block."""
+
+    def __init__(self, trace_memory=True, max_events=100000):
+        self.profiler = Profiler(trace_memory, max_events)
+
+    def __enter__(self):
+        return enable(self.profiler)
+
+    def __exit__(self, *exc_info):
+        disable()
+
+
+class _NullStage(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def record(self, value):
+        return value
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage(object):
+    def __init__(self, profiler, name, inputs):
+        self.profiler = profiler
+        self.name = name
+        self.inputs = inputs
+        self.bytes_out = 0
+
+    def __enter__(self):
+        self.frame = self.profiler.enter(self.name, _nbytes(self.inputs))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.exit(self.frame, self.bytes_out)
+
+    def record(self, value):
+        # Counts ``value``'s arrays as the stage's output and returns it
+        self.bytes_out += _nbytes(value)
+        return value
+
+
+def stage(name, *inputs):
+    """Context manager timing a block as stage ``name``.
+
+    ``inputs`` are counted as the stage's input arrays, and ``record`` on the
+    returned object counts outputs. Costs one global lookup while profiling is
+    off.
+    """
+    profiler = _profiler
+    if profiler is None:
+        return _NULL_STAGE
+    return _Stage(profiler, name, inputs)
+
+
+def profiled(name=None):
+    """Decorator recording every call of a function as stage ``name``.
+
+    The stage defaults to the function's name. Array arguments and the return
+    value are counted as the stage's input and output bytes.
+    """
+    def decorate(function):
+        stage_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profiler = _profiler
+            if profiler is None:
+                return function(*args, **kwargs)
+            frame = profiler.enter(stage_name, _nbytes(args) + _nbytes(tuple(kwargs.values())))
+            result = None
+            try:
+                result = function(*args, **kwargs)
+                return result
+            finally:
+                profiler.exit(frame, _nbytes(result))
+
+        return wrapper
+
+    return decorate
+
+
+def profile_from_environment():
+    # ALLOCATION_PROFILE=trace.json profiles the rest of the run. Only entry
+    # points call this, importing the pipeline never starts a profiler
+    path = os.environ.get(PROFILE_ENV)
+    if not path or _profiler is not None:
+        return None
+    profiler = enable(Profiler(trace_memory=os.environ.get(PROFILE_ENV + "_MEMORY", "1") != "0"))
+
+    def write():
+        disable()
+        try:
+            profiler.write(path)
+        except OSError as error:
+            print(f"Could not write the profile to {path}: {error}", file=sys.stderr)
+
+    atexit.register(write)
+    return profiler
+
+
+def main(argv=None):
+    # python profiling.py --output trace.json main.py --batch 0.1 0.5
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Runs a pipeline script with stage profiling.")
+    parser.add_argument("--output", default="profile.json",
+                        help="JSON summary plus Chrome trace events (default profile.json)")
+    parser.add_argument("--folded", help="also write folded stacks for flamegraph.pl")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peaks")
+    parser.add_argument("script")
+    parser.add_argument("arguments", nargs=argparse.REMAINDER)
+    arguments = parser.parse_args(argv)
+
+    sys.argv = [arguments.script] + arguments.arguments
+    sys.path.insert(0, os.path.dirname(os.path.abspath(arguments.script)))
+    with profile(trace_memory=not arguments.no_memory) as profiler:
+        try:
+            runpy.run_path(arguments.script, run_name="__main__")
+        except SystemExit as exit:
+            if exit.code not in (None, 0):
+                raise
+    profiler.write(arguments.output)
+    if arguments.folded:
+        profiler.write_folded(arguments.folded)
+    print(profiler.report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    # The pipeline imports this file as ``profiling``, which must hold the
+    # active profiler rather than this ``__main__`` copy
+    import profiling
+
+    profiling.main()
@@ -0,0 +1,198 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import sparse_support
+from allocator import solve_allocation
+from b_values import calculate_b_values
+
+SCENARIO_COLUMNS = ("scenario", "alpha", "pref_scalar", "capacities", "constraints", "team",
+                    "project", "b_value", "objective", "exitflag", "status", "runtime")
+
+
+class Scenario(object):
+    """One what-if allocation: b value scalars plus capacity and pair constraints.
+
+    ``capacities`` is a per-project vector (None for one place each) and
+    ``forced``/``forbidden`` are zero-based (team, project) pairs as taken by
+    ``solve_allocation``. ``capacity_label`` and ``constraint_label`` name them
+    in the results table.
+    """
+
+    def __init__(self, index, alpha, pref_scalar, capacities=None, forced=(), forbidden=(),
+                 capacity_label="default", constraint_label="none"):
+        self.index = index
+        self.alpha = alpha
+        self.pref_scalar = pref_scalar
+        self.capacities = capacities
+        self.forced = forced
+        self.forbidden = forbidden
+        self.capacity_label = capacity_label
+        self.constraint_label = constraint_label
+
+    def __repr__(self):
+        return (f"Scenario({self.index}, alpha={self.alpha}, pref_scalar={self.pref_scalar}, "
+                f"capacities={self.capacity_label}, constraints={self.constraint_label})")
+
+
+def scenario_grid(alphas=(1,), pref_scalars=(0.1,), capacities=None, constraints=None):
+    """Every combination of the given scalars, capacity vectors and constraint sets.
+
+    ``capacities`` maps a label to a per-project capacity vector and
+    ``constraints`` maps a label to a ``(forced, forbidden)`` pair, both default
+    to a single unconstrained entry.
+    """
+    capacities = capacities or {"default": None}
+    constraints = constraints or {"none": ((), ())}
+    grid = itertools.product(alphas, pref_scalars, capacities.items(), constraints.items())
+    return [Scenario(index, alpha, pref_scalar, capacity, forced, forbidden, capacity_label, constraint_label)
+            for index, (alpha, pref_scalar, (capacity_label, capacity),
+                        (constraint_label, (forced, forbidden))) in enumerate(grid)]
+
+
+class SharedMatrices(object):
+    """The impact, fit and preference matrices in one shared memory block.
+
+    Worker processes attach to the block by name instead of receiving a pickled
+    copy of the matrices with every task. A sparse cohort shares its CSR
+    arrays (one index structure and three data vectors) rather than dense
+    matrices. The creating process owns the block and must ``close`` it,
+    which also unlinks it.
+    """
+
+    def __init__(self, data):
+        if data.is_sparse:
+            impact = data.impact
+            parts = [impact.data, sparse_support.gather(data.capability, impact),
+                     sparse_support.gather(data.preference, impact), impact.indices, impact.indptr]
+            sparse_shape = tuple(impact.shape)
+        else:
+            parts = [np.asarray(matrix, dtype=np.float64) for matrix in data.arrays()]
+            sparse_shape = None
+        layout, size = [], 0
+        for part in parts:
+            layout.append((size, part.shape, part.dtype.str))
+            # Keep every part 8 byte aligned
+            size += -(-part.nbytes // 8) * 8
+        self.block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        # Everything a worker needs to attach, small enough to pickle
+        self.spec = (self.block.name, layout, sparse_shape)
+        for part, shared in zip(parts, _views(self.block, layout)):
+            shared[...] = part
+
+    def close(self):
+        self.block.close()
+        self.block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Set in every worker by _attach
+_worker_block = None
+_worker_matrices = None
+
+
+def _views(block, layout):
+    return [np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf, offset=offset)
+            for offset, shape, dtype in layout]
+
+
+def _attach(spec):
+    global _worker_block, _worker_matrices
+    name, layout, sparse_shape = spec
+    _worker_block = shared_memory.SharedMemory(name=name)
+    parts = _views(_worker_block, layout)
+    if sparse_shape is None:
+        _worker_matrices = tuple(parts)
+    else:
+        impact_data, capability, preference, indices, indptr = parts
+        impact = sparse_support.from_parts(impact_data, indices, indptr, sparse_shape)
+        _worker_matrices = (impact, sparse_support.on_structure(impact, capability),
+                            sparse_support.on_structure(impact, preference))
+
+
+def _solve(matrices, scenario, allow_unassigned):
+    start = time.perf_counter()
+    impact, capability, preference = matrices
+    b_values = calculate_b_values(impact, capability, preference, scenario.pref_scalar, scenario.alpha)
+    if sparse_support.issparse(b_values):
+        # The allocator works on the full teams x projects matrix
+        b_values = b_values.toarray()
+    result = solve_allocation(b_values, scenario.forced, scenario.forbidden,
+                              scenario.capacities, allow_unassigned)
+    obtained = np.full(len(b_values), np.nan)
+    teams = np.flatnonzero(result.assignment >= 0)
+    obtained[teams] = b_values[teams, result.assignment[teams]]
+    return scenario, result, obtained, time.perf_counter() - start
+
+
+def _solve_in_worker(scenario, allow_unassigned):
+    return _solve(_worker_matrices, scenario, allow_unassigned)
+
+
+def _rows(outcome, team_names, project_names):
+    # One tidy row per team of a solved scenario
+    scenario, result, obtained, runtime = outcome
+    team_count = len(team_names)
+    projects = np.where(result.assignment >= 0, result.assignment, 0)
+    return pd.DataFrame({
+        "scenario": np.full(team_count, scenario.index),
+        "alpha": scenario.alpha,
+        "pref_scalar": scenario.pref_scalar,
+        "capacities": scenario.capacity_label,
+        "constraints": scenario.constraint_label,
+        "team": team_names,
+        "project": np.where(result.assignment >= 0, np.asarray(project_names)[projects], None),
+        "b_value": obtained,
+        "objective": result.objective,
+        "exitflag": result.exitflag,
+        "status": result.status,
+        "runtime": runtime,
+    }, columns=SCENARIO_COLUMNS)
+
+
+def run_scenarios(data, scenarios, processes=None, allow_unassigned=False):
+    """Solves every scenario on ``data`` and returns one tidy results table.
+
+    The table has one row per (scenario, team) with the project the team got,
+    the b value it obtained (NaN when unallocated or infeasible) and the
+    scenario's objective, exit flag and runtime in seconds. Scenarios are spread
+    over ``processes`` worker processes (all cores by default) that share the
+    input matrices through shared memory, ``processes=1`` solves in this
+    process.
+    """
+    scenarios = list(scenarios)
+    if processes == 1 or len(scenarios) <= 1:
+        matrices = data.arrays()
+        outcomes = [_solve(matrices, scenario, allow_unassigned) for scenario in scenarios]
+    else:
+        processes = min(processes or os.cpu_count() or 1, len(scenarios))
+        with SharedMatrices(data) as shared:
+            with ProcessPoolExecutor(processes, initializer=_attach, initargs=(shared.spec,)) as pool:
+                # A few batches per worker keeps the pool busy without a round
+                # trip for every small scenario
+                chunksize = max(1, len(scenarios) // (4 * processes))
+                outcomes = list(pool.map(_solve_in_worker, scenarios,
+                                         itertools.repeat(allow_unassigned), chunksize=chunksize))
+
+    if not outcomes:
+        return pd.DataFrame(columns=SCENARIO_COLUMNS)
+    return pd.concat([_rows(outcome, data.team_names, data.project_names) for outcome in outcomes],
+                     ignore_index=True)
+
+
+def scenario_summary(results):
+    # One row per scenario: objective, runtime and how many teams were allocated
+    grouped = results.groupby(["scenario", "alpha", "pref_scalar", "capacities", "constraints"], sort=True)
+    return grouped.agg(objective=("objective", "first"), exitflag=("exitflag", "first"),
+                       runtime=("runtime", "first"), allocated=("project", "count"),
+                       mean_b_value=("b_value", "mean")).reset_index()
@@ -0,0 +1,366 @@
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from allocator import solve_allocation
+from profiling import profiled
+
+MAGIC = b"ALLOCSES"
+VERSION = 1
+# magic, version, matrix count, teams, projects, metadata offset and length, log offset
+HEADER = struct.Struct("<8sIIQQQQQ")
+# name, dtype (e.g. "<f8"), offset, bytes of every stored matrix
+MATRIX_ENTRY = struct.Struct("<16s8sQQ")
+ALIGNMENT = 64
+
+# Event kinds of the edit log, modelled on the Action records of
+# Scripts/Experiment Testing/analysis.py and the edits of IncrementalAllocator
+ALLOCATE = 1  # team was given project
+REMOVE = 2  # team's allocation was removed
+PIN = 3  # team is forced to project in later solves, replacing an earlier pin
+FORBID = 4  # team may not be given project in later solves
+RELEASE = 5  # clears any pin or ban on the (team, project) pair
+EVENT_KINDS = {ALLOCATE: "allocate", REMOVE: "remove", PIN: "pin", FORBID: "forbid", RELEASE: "release"}
+EVENT = struct.Struct("<diiB7x")
+EVENT_DTYPE = np.dtype([("time", "<f8"), ("team", "<i4"), ("project", "<i4"), ("kind", "u1"),
+                        ("reserved", "V7")])
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class SessionState(object):
+    """The state of a session after replaying its edit log.
+
+    ``assignment[i]`` is team i's project or -1, ``pinned[i]`` the project
+    team i is forced to or -1, and ``forbidden`` a k x 2 array of banned
+    (team, project) pairs. ``events`` is the number of events replayed.
+    """
+
+    def __init__(self, assignment, pinned, forbidden, events):
+        self.assignment = assignment
+        self.pinned = pinned
+        self.forbidden = forbidden
+        self.events = events
+
+    def forced_pairs(self):
+        # Pins as (team, project) pairs for solve_allocation
+        teams = np.flatnonzero(self.pinned >= 0)
+        return np.column_stack((teams, self.pinned[teams]))
+
+    def forbidden_pairs(self):
+        return self.forbidden
+
+    def __repr__(self):
+        return (f"SessionState(events={self.events}, allocated={np.count_nonzero(self.assignment >= 0)}, "
+                f"pinned={np.count_nonzero(self.pinned >= 0)}, forbidden={len(self.forbidden)})")
+
+
+def _last_by_key(keys, positions):
+    # (distinct keys, position of the last event of each) of the events at
+    # ``positions``, which are in log order
+    keys, positions = keys[::-1], positions[::-1]
+    distinct, first = np.unique(keys, return_index=True)
+    return distinct, positions[first]
+
+
+def _released_after(released, pair_keys, positions):
+    # Whether each pair was released after the event at ``positions``,
+    # ``released`` is the _last_by_key output of the release events
+    keys, last_release = released
+    if not len(keys):
+        return np.zeros(len(pair_keys), dtype=bool)
+    found = np.minimum(np.searchsorted(keys, pair_keys), len(keys) - 1)
+    return (keys[found] == pair_keys) & (last_release[found] > positions)
+
+
+@profiled("replay")
+def replay(events, team_count, project_count):
+    """Replays an edit log (an ``EVENT_DTYPE`` array) into a ``SessionState``.
+
+    Every part of the state only depends on the last relevant event of its
+    team or pair, so the log is replayed with a few sorts instead of a loop
+    over the events.
+    """
+    kinds = events["kind"]
+    teams = events["team"].astype(np.int64)
+    pairs = teams * project_count + events["project"]
+
+    assignment = np.full(team_count, -1, dtype=np.intp)
+    changes = np.flatnonzero((kinds == ALLOCATE) | (kinds == REMOVE))
+    changed, last = _last_by_key(teams[changes], changes)
+    assignment[changed] = np.where(kinds[last] == ALLOCATE, events["project"][last], -1)
+
+    # Last release of every pair
+    releases = np.flatnonzero(kinds == RELEASE)
+    released = _last_by_key(pairs[releases], releases)
+
+    pinned = np.full(team_count, -1, dtype=np.intp)
+    pins = np.flatnonzero(kinds == PIN)
+    pinned_teams, last_pin = _last_by_key(teams[pins], pins)
+    active = ~_released_after(released, pairs[last_pin], last_pin)
+    pinned[pinned_teams[active]] = events["project"][last_pin[active]]
+
+    bans = np.flatnonzero(kinds == FORBID)
+    banned, last_ban = _last_by_key(pairs[bans], bans)
+    banned = banned[~_released_after(released, banned, last_ban)]
+    forbidden = np.column_stack((banned // project_count, banned % project_count)).astype(np.intp)
+    return SessionState(assignment, pinned, forbidden, len(events))
+
+
+class SessionStore(object):
+    """Binary allocation session: fixed matrices plus an append-only edit log.
+
+    The file starts with a small header, a directory of the stored matrices
+    and a JSON block of team/project names and metadata. The matrices follow
+    as raw little-endian arrays on 64 byte boundaries, so reopening a session
+    memory-maps them instead of reading them. Everything after the header
+    region is the edit log of fixed size ``EVENT_DTYPE`` records (allocate,
+    remove, pin, forbid, release).
+
+    Recording an edit appends one 24 byte record, whatever the cohort size.
+    Opening reads the log in one ``np.fromfile`` and ``state`` replays it
+    vectorised. A record torn by a crash mid-append is ignored on open and
+    overwritten by the next append.
+    """
+
+    def __init__(self, path, handle, team_count, project_count, matrices, names, log_offset, writable):
+        self.path = path
+        self.team_count = team_count
+        self.project_count = project_count
+        self.matrices = matrices
+        self.team_names = names["team_names"]
+        self.project_names = names["project_names"]
+        self.metadata = names["metadata"]
+        self.log_offset = log_offset
+        self.writable = writable
+        self._handle = handle
+        handle.seek(0)
+        self._events = np.fromfile(handle, dtype=EVENT_DTYPE, offset=log_offset)
+        # The log ends after the last complete record
+        self._end = log_offset + len(self._events) * EVENT_DTYPE.itemsize
+        self._pending = []
+        self._state = None
+
+    @classmethod
+    def create(cls, path, b_values, team_names=None, project_names=None, matrices=None, metadata=None,
+               overwrite=False):
+        """Writes a new session file and returns it opened for appending.
+
+        ``b_values`` is the teams x projects matrix the session allocates on,
+        ``matrices`` optional further named matrices of the same shape (e.g.
+        impact, capability, preference) and ``metadata`` any JSON-compatible
+        dict, e.g. the scalars the b values were computed with. Float32
+        matrices stay float32.
+        """
+        b_values = np.asarray(b_values)
+        team_count, project_count = b_values.shape
+        stored = {"b_values": b_values}
+        for name, matrix in (matrices or {}).items():
+            matrix = matrix.toarray() if hasattr(matrix, "toarray") else np.asarray(matrix)
+            if matrix.shape != b_values.shape:
+                raise ValueError(f"Matrix '{name}' has shape {matrix.shape}, expected {b_values.shape}")
+            stored[name] = matrix
+        for name in stored:
+            if len(name.encode("ascii")) > 16:
+                raise ValueError(f"Matrix name '{name}' is longer than 16 characters")
+
+        names = {
+            "team_names": [str(name) for name in (team_names if team_names is not None
+                                                   else range(1, team_count + 1))],
+            "project_names": [str(name) for name in (project_names if project_names is not None
+                                                      else range(1, project_count + 1))],
+            "metadata": metadata or {},
+        }
+        encoded = json.dumps(names).encode("utf-8")
+
+        metadata_offset = HEADER.size + MATRIX_ENTRY.size * len(stored)
+        offset = _aligned(metadata_offset + len(encoded))
+        entries, arrays = [], []
+        for name, matrix in stored.items():
+            array = np.ascontiguousarray(matrix, dtype=matrix.dtype.newbyteorder("<"))
+            entries.append(MATRIX_ENTRY.pack(name.encode("ascii"), array.dtype.str.encode("ascii"),
+                                             offset, array.nbytes))
+            arrays.append((offset, array))
+            offset = _aligned(offset + array.nbytes)
+        log_offset = offset
+
+        with open(path, "wb" if overwrite else "xb") as handle:
+            handle.write(HEADER.pack(MAGIC, VERSION, len(stored), team_count, project_count,
+                                     metadata_offset, len(encoded), log_offset))
+            handle.write(b"".join(entries))
+            handle.write(encoded)
+            for offset, array in arrays:
+                handle.seek(offset)
+                handle.write(array.tobytes())
+            handle.truncate(log_offset)
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path, writable=True):
+        handle = open(path, "r+b" if writable else "rb")
+        try:
+            header = handle.read(HEADER.size)
+            if len(header) < HEADER.size or header[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not an allocation session file")
+            (_, version, matrix_count, team_count, project_count,
+             metadata_offset, metadata_length, log_offset) = HEADER.unpack(header)
+            if version != VERSION:
+                raise ValueError(f"{path} has session format version {version}, expected {VERSION}")
+            entries = [MATRIX_ENTRY.unpack(handle.read(MATRIX_ENTRY.size)) for _ in range(matrix_count)]
+            handle.seek(metadata_offset)
+            names = json.loads(handle.read(metadata_length).decode("utf-8"))
+
+            matrices = {}
+            for name, dtype, offset, nbytes in entries:
+                name = name.rstrip(b"\0").decode("ascii")
+                dtype = np.dtype(dtype.rstrip(b"\0").decode("ascii"))
+                if nbytes != team_count * project_count * dtype.itemsize:
+                    raise ValueError(f"Matrix '{name}' in {path} has the wrong size")
+                matrices[name] = np.memmap(path, dtype=dtype, mode="r", offset=offset,
+                                           shape=(team_count, project_count))
+            store = cls(path, handle, team_count, project_count, matrices, names, log_offset, writable)
+        except Exception:
+            handle.close()
+            raise
+        return store
+
+    @property
+    def b_values(self):
+        return self.matrices["b_values"]
+
+    def __len__(self):
+        return len(self._events) + len(self._pending)
+
+    @property
+    def events(self):
+        # Every recorded event as an EVENT_DTYPE array
+        self._collect()
+        return self._events
+
+    def _collect(self):
+        if self._pending:
+            self._events = np.concatenate((self._events, np.array(self._pending, dtype=EVENT_DTYPE)))
+            self._pending = []
+
+    def record(self, kind, team, project=-1, timestamp=None):
+        """Appends one event to the log, an O(1) write at the end of the file."""
+        if not self.writable:
+            raise ValueError(f"{self.path} was opened read-only")
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event kind {kind}")
+        if not 0 <= team < self.team_count:
+            raise IndexError(f"Team {team} out of range for {self.team_count} teams")
+        if kind != REMOVE and not 0 <= project < self.project_count:
+            raise IndexError(f"Project {project} out of range for {self.project_count} projects")
+        timestamp = time.time() if timestamp is None else timestamp
+        self._handle.seek(self._end)
+        self._handle.write(EVENT.pack(timestamp, team, project, kind))
+        self._handle.flush()
+        self._end += EVENT.size
+        self._pending.append((timestamp, team, project, kind, b"\0" * 7))
+        self._state = None
+
+    def record_many(self, kinds, teams, projects, timestamp=None):
+        # Appends a batch of events in one write, e.g. a solver's allocation
+        if not self.writable:
+            raise ValueError(f"{self.path} was opened read-only")
+        records = np.zeros(len(teams), dtype=EVENT_DTYPE)
+        records["time"] = time.time() if timestamp is None else timestamp
+        records["team"], records["project"], records["kind"] = teams, projects, kinds
+        if not np.all(np.isin(records["kind"], list(EVENT_KINDS))):
+            raise ValueError("Unknown event kind")
+        if np.any((records["team"] < 0) | (records["team"] >= self.team_count)):
+            raise IndexError(f"Team out of range for {self.team_count} teams")
+        projects_used = records["kind"] != REMOVE
+        if np.any(projects_used & ((records["project"] < 0) | (records["project"] >= self.project_count))):
+            raise IndexError(f"Project out of range for {self.project_count} projects")
+        self._handle.seek(self._end)
+        self._handle.write(records.tobytes())
+        self._handle.flush()
+        self._end += records.nbytes
+        self._collect()
+        self._events = np.concatenate((self._events, records))
+        self._state = None
+
+    def allocate(self, team, project, timestamp=None):
+        self.record(ALLOCATE, team, project, timestamp)
+
+    def remove(self, team, timestamp=None):
+        self.record(REMOVE, team, -1, timestamp)
+
+    def pin(self, team, project, timestamp=None):
+        self.record(PIN, team, project, timestamp)
+
+    def forbid(self, team, project, timestamp=None):
+        self.record(FORBID, team, project, timestamp)
+
+    def release(self, team, project, timestamp=None):
+        self.record(RELEASE, team, project, timestamp)
+
+    def state(self, upto=None):
+        """``SessionState`` after the first ``upto`` events (all by default)."""
+        if upto is None and self._state is not None:
+            return self._state
+        events = self.events if upto is None else self.events[:upto]
+        state = replay(events, self.team_count, self.project_count)
+        if upto is None:
+            self._state = state
+        return state
+
+    def solve(self, allocator=solve_allocation, capacities=None, allow_unassigned=False, timestamp=None):
+        """Re-runs ``allocator`` with the session's pins and bans and logs the result.
+
+        Only teams whose project changed get an allocate or remove event, so
+        an unchanged re-run adds nothing to the log. Returns the allocator's
+        result.
+        """
+        state = self.state()
+        result = allocator(np.asarray(self.b_values), state.forced_pairs(), state.forbidden_pairs(),
+                           capacities, allow_unassigned)
+        if not getattr(result, "feasible", True):
+            return result
+        changed = np.flatnonzero(result.assignment != state.assignment)
+        if len(changed):
+            projects = result.assignment[changed]
+            self.record_many(np.where(projects >= 0, ALLOCATE, REMOVE), changed, projects, timestamp)
+        return result
+
+    def compact(self, path):
+        """Writes a copy whose log is the current state only.
+
+        Used when a long session's log has grown much larger than its state.
+        Returns the new store, this one is left unchanged.
+        """
+        state = self.state()
+        others = {name: matrix for name, matrix in self.matrices.items() if name != "b_values"}
+        store = SessionStore.create(path, self.b_values, self.team_names, self.project_names,
+                                    others, self.metadata)
+        allocated = np.flatnonzero(state.assignment >= 0)
+        pinned = np.flatnonzero(state.pinned >= 0)
+        kinds = np.concatenate((np.full(len(pinned), PIN), np.full(len(state.forbidden), FORBID),
+                                np.full(len(allocated), ALLOCATE)))
+        teams = np.concatenate((pinned, state.forbidden[:, 0], allocated))
+        projects = np.concatenate((state.pinned[pinned], state.forbidden[:, 1], state.assignment[allocated]))
+        if len(kinds):
+            store.record_many(kinds, teams, projects)
+        return store
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return (f"SessionStore({os.path.basename(self.path)!r}, teams={self.team_count}, "
+                f"projects={self.project_count}, events={len(self)})")
@@ -0,0 +1,82 @@
+import numpy as np
+from scipy import sparse
+
+
+def issparse(matrix):
+    return sparse.issparse(matrix)
+
+
+def as_csr(matrix):
+    # Canonical CSR: sorted column indices and no explicitly stored zeros.
+    # A CSR input shares its arrays, so it is only copied when it must change
+    matrix = sparse.csr_matrix(matrix)
+    if not matrix.has_canonical_format or not matrix.data.all():
+        matrix = matrix.copy()
+        matrix.sum_duplicates()
+        matrix.eliminate_zeros()
+    return matrix
+
+
+def row_ids(matrix):
+    # Row of every stored entry of a CSR matrix
+    return np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+
+
+def row_counts(matrix):
+    return np.diff(matrix.indptr)
+
+
+def row_sums(matrix, values=None):
+    # Per-row sums of the stored entries, or of ``values`` aligned with them
+    values = matrix.data if values is None else values
+    return np.bincount(row_ids(matrix), weights=values, minlength=matrix.shape[0])
+
+
+def row_max(matrix):
+    # Largest stored entry of every row, NaN for rows without entries
+    maxima = np.full(matrix.shape[0], np.nan)
+    filled = np.flatnonzero(row_counts(matrix))
+    if len(filled):
+        maxima[filled] = np.maximum.reduceat(matrix.data, matrix.indptr[filled])
+    return maxima
+
+
+def with_data(matrix, data):
+    # Same sparsity structure, new stored values
+    return sparse.csr_matrix((data, matrix.indices.copy(), matrix.indptr.copy()), shape=matrix.shape)
+
+
+def from_parts(data, indices, indptr, shape):
+    # CSR matrix straight from its arrays, which must already be canonical
+    index_dtype = np.int32 if max(len(data), shape[1]) < 2 ** 31 else np.int64
+    return sparse.csr_matrix((data, np.asarray(indices, dtype=index_dtype), np.asarray(indptr, dtype=index_dtype)),
+                             shape=shape, copy=False)
+
+
+def on_structure(matrix, data):
+    # Like with_data, but the new matrix shares ``matrix``'s index arrays
+    return sparse.csr_matrix((data, matrix.indices, matrix.indptr), shape=matrix.shape, copy=False)
+
+
+def _same_array(array, other):
+    # Shared index arrays (as made by on_structure) are compared without a scan
+    if (array.dtype == other.dtype and array.shape == other.shape and array.strides == other.strides
+            and array.ctypes.data == other.ctypes.data):
+        return True
+    return np.array_equal(array, other)
+
+
+def same_structure(matrix, other):
+    return (matrix.shape == other.shape and _same_array(matrix.indptr, other.indptr)
+            and _same_array(matrix.indices, other.indices))
+
+
+def gather(matrix, support):
+    # Values of a dense or sparse ``matrix`` at the stored entries of the CSR
+    # ``support``, free when ``matrix`` already has the same structure
+    if issparse(matrix):
+        matrix = as_csr(matrix)
+        if same_structure(matrix, support):
+            return matrix.data
+        return np.asarray(matrix[row_ids(support), support.indices]).ravel()
+    return np.asarray(matrix)[row_ids(support), support.indices]
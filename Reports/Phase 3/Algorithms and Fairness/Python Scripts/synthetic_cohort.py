@@ -0,0 +1,93 @@
+import numpy as np
+
+from allocation_data import DEFAULT_SHEETS, AllocationData, save_allocation_npz
+
+
+def generate_cohort(team_count, project_count, seed=None, impact_density=0.3, max_impact=3,
+                    max_fit=8, max_pref=7, correlation=0.6, popular_fraction=0.1,
+                    popular_boost=2.0, dtype=np.float64):
+    """Synthetic cohort with the impact, fit and preference matrices of a real one.
+
+    All three matrices are drawn in bulk from one ``numpy.random.Generator``
+    seeded with ``seed``, so the same arguments always give the same cohort.
+
+    * impact is zero-heavy: a pairing is viable with probability
+      ``impact_density`` and then scores 1..``max_impact``.
+    * fit and preference are integers in 0..``max_fit``/0..``max_pref`` drawn
+      from a shared latent score, so they are correlated by ``correlation``.
+    * a ``popular_fraction`` of projects is contested: their preference is
+      shifted up by ``popular_boost`` standard deviations and they are viable
+      for twice as many teams.
+    """
+    rng = np.random.default_rng(seed)
+    shape = (team_count, project_count)
+
+    popular = rng.random(project_count) < popular_fraction
+    density = np.where(popular, min(1.0, 2 * impact_density), impact_density)
+    viable = rng.random(shape, dtype=np.float32) < density
+    impact = viable * rng.integers(1, max_impact + 1, size=shape, dtype=np.int16)
+
+    latent = rng.standard_normal(shape, dtype=np.float32)
+    noise = rng.standard_normal(shape, dtype=np.float32)
+    fit_score = latent
+    pref_score = correlation * latent + np.sqrt(1 - correlation ** 2) * noise
+    pref_score += np.where(popular, popular_boost, 0.0).astype(np.float32)
+
+    def to_scale(score, maximum):
+        # Standard normal scores to integers 0..maximum, centred on the middle
+        scaled = np.rint((score + 2.5) / 5.0 * maximum)
+        return np.clip(scaled, 0, maximum)
+
+    team_names = np.array([f"T{i}" for i in range(1, team_count + 1)])
+    project_names = np.array([f"P{j}" for j in range(1, project_count + 1)])
+    return AllocationData(impact.astype(dtype), to_scale(fit_score, max_fit).astype(dtype),
+                          to_scale(pref_score, max_pref).astype(dtype), team_names, project_names)
+
+
+def write_workbook(data, filename, sheets=DEFAULT_SHEETS):
+    """Writes a cohort in the "IFB398 24se1 Project Allocation.xlsx" layout.
+
+    Each sheet has a ``team_id, impact, P1..Pn`` header, one description row and
+    then one row per team, which is what ``load_allocation_data`` expects with
+    its default arguments. openpyxl's write-only mode streams the rows to disk
+    instead of building every cell object in memory.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    project_names = [str(name) for name in data.project_names]
+    for sheet_name, matrix in zip(sheets, (data.impact, data.capability, data.preference)):
+        sheet = workbook.create_sheet(title=sheet_name)
+        sheet.append(["team_id", "impact"] + project_names)
+        sheet.append([None, None] + [f"Project {name}" for name in project_names])
+        values = np.asarray(matrix)
+        if np.all(values == np.rint(values)):
+            values = values.astype(np.int64)
+        for team, row in zip(data.team_names, values.tolist()):
+            sheet.append([str(team), None] + row)
+    workbook.save(filename)
+
+
+def write_cohort(data, filename):
+    # Writes .npz for large stress fixtures and .xlsx for everything else
+    if filename.lower().endswith(".npz"):
+        save_allocation_npz(data, filename)
+    else:
+        write_workbook(data, filename)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic allocation cohort")
+    parser.add_argument("teams", type=int)
+    parser.add_argument("projects", type=int)
+    parser.add_argument("filename", help=".xlsx workbook or .npz binary")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--density", type=float, default=0.3, help="share of viable pairings")
+    parser.add_argument("--float32", action="store_true", help="store the matrices as float32")
+    args = parser.parse_args()
+
+    cohort = generate_cohort(args.teams, args.projects, seed=args.seed, impact_density=args.density,
+                             dtype=np.float32 if args.float32 else np.float64)
+    write_cohort(cohort, args.filename)
@@ -0,0 +1,174 @@
+import os
+
+import numpy as np
+from matplotlib import rcParams
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from b_values import calculate_b_values
+from profiling import profiled
+from team_statistics import team_statistics
+
+
+class BlitManager(object):
+    """Redraws a fixed set of animated artists over a cached figure background.
+
+    The background is captured on every full draw (first show, resize), after
+    which ``update`` only restores it, draws the animated artists and blits the
+    figure. Canvases without blitting support fall back to ``draw_idle``.
+    """
+
+    def __init__(self, canvas, artists=()):
+        self.canvas = canvas
+        self.background = None
+        self.artists = []
+        for artist in artists:
+            self.add_artist(artist)
+        self.draw_id = canvas.mpl_connect("draw_event", self.on_draw)
+
+    def add_artist(self, artist):
+        artist.set_animated(True)
+        self.artists.append(artist)
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        figure = self.canvas.figure
+        for artist in self.artists:
+            figure.draw_artist(artist)
+
+    def update(self):
+        if not getattr(self.canvas, "supports_blit", False):
+            self.canvas.draw_idle()
+            return
+        if self.background is None:
+            # The first full draw captures the background and draws the artists
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self._draw_animated()
+        self.canvas.blit(self.canvas.figure.bbox)
+        self.canvas.flush_events()
+
+
+class TeamScatter(object):
+    """main.py's scatter of every team's normalized non-zero b values.
+
+    All points live in one scatter collection, coloured by project index, with
+    one row per team sorted by max b value or by sigma. The team names and
+    sigma labels are plain text artists at fixed row positions, so a new b
+    value matrix only changes offsets, colours and label strings and never
+    rebuilds the axes. Rows are labelled as densely as the font size allows.
+    With a ``BlitManager`` those artists are animated and updates are blitted,
+    without one the figure is redrawn as usual.
+    """
+
+    def __init__(self, ax, team_names, project_count, blit_manager=None):
+        self.ax = ax
+        self.team_names = np.asarray(team_names).astype(str)
+        self.blit_manager = blit_manager
+        team_count = len(self.team_names)
+
+        self.collection = ax.scatter(np.empty(0), np.empty(0), c=np.empty(0), cmap="viridis", s=5,
+                                     vmin=0, vmax=max(project_count - 1, 1))
+        # Row labels in axes coordinates horizontally and data coordinates vertically
+        transform = ax.get_yaxis_transform()
+        size = rcParams["ytick.labelsize"]
+        self.team_labels = [ax.text(-0.01, row, "", transform=transform, ha="right", va="center",
+                                    fontsize=size) for row in range(team_count)]
+        self.sigma_labels = [ax.text(1.01, row, "", transform=transform, ha="left", va="center",
+                                     fontsize=size) for row in range(team_count)]
+
+        ax.set_ylim(-1, team_count)
+        ax.set_xlim(-0.05, 1.05)
+        ax.set_yticks([])
+        ax.set_xlabel("B Values")
+        ax.set_ylabel("Teams")
+        ax.yaxis.set_label_coords(-0.08, 0.5)
+        ax.text(1.08, 0.5, "Sigma (Urgency Coefficient)", transform=ax.transAxes,
+                rotation=90, ha="left", va="center")
+        ax.set_title("Scatter Plot of Non-Zero B Values by Team")
+
+        if blit_manager is not None:
+            for artist in [self.collection] + self.team_labels + self.sigma_labels:
+                blit_manager.add_artist(artist)
+        self.thin_labels()
+        ax.figure.canvas.mpl_connect("resize_event", self.thin_labels)
+
+        self.order = None
+        self.sigma = None
+
+    def thin_labels(self, event=None):
+        # Hides row labels that would overlap their neighbours, drawing text is
+        # the most expensive part of an update
+        if not self.team_labels:
+            return
+        row_height = self.ax.bbox.height / (len(self.team_labels) + 1)
+        text_height = self.team_labels[0].get_fontsize() * self.ax.figure.dpi / 72 * 1.2
+        step = max(1, int(np.ceil(text_height / max(row_height, 1e-9))))
+        for row, (label, sigma_label) in enumerate(zip(self.team_labels, self.sigma_labels)):
+            label.set_visible(row % step == 0)
+            sigma_label.set_visible(row % step == 0)
+
+    def set_b_values(self, b_values, sort_by_sigma=False):
+        # Recomputes positions and labels, then redraws
+        self.set_statistics(team_statistics(b_values), sort_by_sigma)
+
+    @profiled("plot")
+    def set_statistics(self, statistics, sort_by_sigma=False):
+        # Same as set_b_values from an already computed TeamStatistics, teams
+        # without non-zero b values sort last by max b value
+        order = statistics.order(sort_by_sigma)
+        rows, projects, x = statistics.non_zero(order)
+        self.collection.set_offsets(np.column_stack((x, rows)))
+        self.collection.set_array(projects)
+
+        sigma = statistics.sigma
+        sigma_text = np.around(sigma[order], decimals=3).astype(str)
+        for label, sigma_label, team, text in zip(self.team_labels, self.sigma_labels, order, sigma_text):
+            label.set_text(self.team_names[team])
+            sigma_label.set_text(text)
+        self.order, self.sigma = order, sigma
+
+        low = min(0.0, x.min()) if len(x) else 0.0
+        if low < self.ax.get_xlim()[0]:
+            # Limits are part of the cached background, a change needs a full draw
+            self.ax.set_xlim(low - 0.05, 1.05)
+            self.ax.figure.canvas.draw_idle()
+        else:
+            self.draw()
+
+    def draw(self):
+        if self.blit_manager is not None:
+            self.blit_manager.update()
+        else:
+            self.ax.figure.canvas.draw_idle()
+
+
+@profiled("render")
+def render_scalars(data, pref_scalars, directory, sort_by_sigma=False, alpha=1, fmt="png",
+                   dpi=100, figsize=(10, 8)):
+    """Renders the team scatter for many preference scalars to image files.
+
+    Uses an off-screen Agg canvas, so no display or interactive backend is
+    needed. One figure is built and only its data changes between frames.
+    Returns the written file names.
+    """
+    os.makedirs(directory, exist_ok=True)
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    figure.subplots_adjust(left=0.1, right=0.9, top=0.95, bottom=0.1)
+    scatter = TeamScatter(ax, data.team_names, data.shape[1])
+
+    filenames = []
+    for pref_scalar in pref_scalars:
+        b_values = calculate_b_values(data.impact, data.capability, data.preference, pref_scalar, alpha)
+        scatter.set_b_values(b_values, sort_by_sigma)
+        ax.set_title(f"Scatter Plot of Non-Zero B Values by Team (preference scalar {pref_scalar:g})")
+        filename = os.path.join(directory, f"team_scatter_{pref_scalar:.3f}.{fmt}")
+        figure.savefig(filename, dpi=dpi)
+        filenames.append(filename)
+    return filenames
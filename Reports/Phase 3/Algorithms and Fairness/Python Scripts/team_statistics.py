@@ -0,0 +1,123 @@
+import numpy as np
+
+import sparse_support
+from profiling import profiled
+
+
+@profiled("normalize")
+def normalize_non_zero(b_values):
+    # Returns (normalized b values, non-zero mask, row maxima) along the last axis,
+    # only the non-zero entries are divided, the rest stay 0. Sparse b values
+    # give CSR normalized values and a CSR mask
+    if sparse_support.issparse(b_values):
+        b_values = sparse_support.as_csr(b_values)
+        max_b = sparse_support.row_max(b_values)
+        normalized = sparse_support.with_data(
+            b_values, b_values.data / max_b[sparse_support.row_ids(b_values)])
+        return normalized, sparse_support.with_data(b_values, np.ones(b_values.nnz, dtype=bool)), max_b
+    mask = b_values != 0
+    max_b = np.where(mask, b_values, -np.inf).max(axis=-1)
+    max_b[~mask.any(axis=-1)] = np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized = np.where(mask, b_values / max_b[..., None], 0)
+    return normalized, mask, max_b
+
+
+@profiled("sigma")
+def sigma_from_normalized(normalized, mask):
+    # (non-zero counts, sigma) from the output of normalize_non_zero
+    if sparse_support.issparse(normalized):
+        # Only the stored entries take part, so the mask is the structure
+        counts = sparse_support.row_counts(normalized)
+        rows = sparse_support.row_ids(normalized)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = sparse_support.row_sums(normalized) / counts
+            sd = np.sqrt(sparse_support.row_sums(normalized, (normalized.data - mean[rows]) ** 2) / counts)
+            sigma = np.where(counts > 0, sd / counts, 0)
+        return counts, sigma
+
+    counts = mask.sum(axis=-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = normalized.sum(axis=-1) / counts
+        deviations = np.where(mask, normalized - mean[..., None], 0)
+        sd = np.sqrt((deviations ** 2).sum(axis=-1) / counts)
+        sigma = np.where(counts > 0, sd / counts, 0)
+    return counts, sigma
+
+
+def descending_order(values, axis=-1):
+    # Indices that sort ``values`` from largest to smallest with NaN last. Equal
+    # values keep the reversed order of ``np.argsort(...)[::-1]`` in the
+    # original plots, the higher team index first
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=-np.inf)
+    return np.flip(np.argsort(values, axis=axis, kind="stable"), axis=axis)
+
+
+class TeamStatistics(object):
+    """Per-team statistics of one b value matrix, shared by plots and allocators.
+
+    ``normalized`` holds every team's non-zero b values divided by the team's
+    largest one (0 elsewhere) and ``mask`` marks the non-zero entries, both
+    dense arrays or both CSR matrices for sparse b values. ``max_b`` is the
+    largest non-zero b value, ``counts`` the number of non-zero b values and
+    ``sigma`` the urgency coefficient (standard deviation of the normalized
+    non-zero b values divided by their count). ``by_max_b`` and ``by_sigma``
+    are team indices in descending order of either.
+
+    Teams whose b values are all zero are flagged in ``empty``: their ``max_b``
+    is NaN, their ``sigma`` 0 and they sort last by max b.
+    """
+
+    def __init__(self, normalized, mask, max_b, counts, sigma):
+        self.normalized = normalized
+        self.mask = mask
+        self.max_b = max_b
+        self.counts = counts
+        self.sigma = sigma
+        self.empty = counts == 0
+        self.by_max_b = descending_order(max_b)
+        self.by_sigma = descending_order(sigma)
+
+    @property
+    def team_count(self):
+        return len(self.max_b)
+
+    def arrays(self):
+        # Every array held, for callers that need to copy or freeze them
+        matrices = (self.normalized, self.mask)
+        if sparse_support.issparse(self.normalized):
+            matrices = tuple(part for matrix in matrices
+                             for part in (matrix.data, matrix.indices, matrix.indptr))
+        return matrices + (self.max_b, self.counts, self.sigma, self.empty, self.by_max_b, self.by_sigma)
+
+    def order(self, sort_by_sigma=False):
+        return self.by_sigma if sort_by_sigma else self.by_max_b
+
+    def non_zero(self, order=None):
+        """(row, project, normalized value) of every non-zero b value.
+
+        Rows are positions in ``order`` (team indices, all teams in index order
+        by default) and entries come row by row in ascending project order.
+        """
+        if order is None:
+            order = np.arange(self.team_count)
+        if sparse_support.issparse(self.normalized):
+            normalized = sparse_support.as_csr(self.normalized[order])
+            return sparse_support.row_ids(normalized), normalized.indices, normalized.data
+        rows, projects = np.nonzero(self.mask[order])
+        return rows, projects, self.normalized[order[rows], projects]
+
+
+@profiled("statistics")
+def team_statistics(b_values, normalized=None):
+    """Computes the ``TeamStatistics`` of a teams x projects b value matrix.
+
+    ``normalized`` can pass the ``(normalized, mask, max_b)`` triple of
+    ``normalize_non_zero`` when it is already known.
+    """
+    if normalized is None:
+        normalized = normalize_non_zero(b_values)
+    normalized, mask, max_b = normalized
+    counts, sigma = sigma_from_normalized(normalized, mask)
+    return TeamStatistics(normalized, mask, max_b, counts, sigma)
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from openpyxl import Workbook
+
+from allocation_data import MatrixValueError, read_workbook
+
+
+def write_workbook(path, fit_cell):
+    # Two teams by three projects, with one fit cell replaced by ``fit_cell``
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for sheet in ("impact", "fit", "pref"):
+        rows = [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]
+        if sheet == "fit":
+            rows[1][2] = fit_cell
+        worksheet = workbook.create_sheet(sheet)
+        worksheet.append(["team", "name", "P1", "P2", "P3"])
+        worksheet.append(["", "", "", "", ""])
+        for team, row in enumerate(rows):
+            worksheet.append([f"T{team + 1}", f"Team {team + 1}"] + row)
+    workbook.save(path)
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_boolean_cell_is_rejected(tmp_path, sparse):
+    path = tmp_path / "cohort.xlsx"
+    write_workbook(path, True)
+    with pytest.raises(MatrixValueError) as error:
+        read_workbook(path, sparse=sparse)
+    assert [cell[:2] for cell in error.value.cells] == [("fit", "E4")]
+    assert error.value.cells[0][4] is True
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_numeric_text_is_accepted(tmp_path, sparse):
+    path = tmp_path / "cohort.xlsx"
+    write_workbook(path, "7")
+    data = read_workbook(path, sparse=sparse)
+    capability = data.capability.toarray() if sparse else data.capability
+    np.testing.assert_array_equal(capability, [[1, 2, 3], [4, 5, 7]])
+    assert list(data.project_names) == ["P1", "P2", "P3"]
@@ -0,0 +1,109 @@
+import itertools
+
+import numpy as np
+import pytest
+from scipy.optimize import linear_sum_assignment
+
+from allocator import solve_allocation
+
+
+def brute_force(b_values, forced, forbidden, capacities, allow_unassigned):
+    # Best total b value over every allocation that meets the constraints,
+    # None when there is none
+    team_count, project_count = b_values.shape
+    options = list(range(project_count)) + ([-1] if allow_unassigned else [])
+    forced, forbidden = dict(forced), set(forbidden)
+    best = None
+    for assignment in itertools.product(options, repeat=team_count):
+        if any(assignment[team] != project for team, project in forced.items()):
+            continue
+        if any((team, project) in forbidden for team, project in enumerate(assignment)):
+            continue
+        allocated = [project for project in assignment if project >= 0]
+        if np.any(np.bincount(allocated, minlength=project_count) > capacities):
+            continue
+        total = sum(b_values[team, project] for team, project in enumerate(assignment) if project >= 0)
+        best = total if best is None else max(best, total)
+    return best
+
+
+def check_constraints(result, forced, forbidden, capacities):
+    assignment = result.assignment
+    allocated = assignment[assignment >= 0]
+    assert np.all(np.bincount(allocated, minlength=len(capacities)) <= capacities)
+    assert all(assignment[team] == project for team, project in forced)
+    assert all(assignment[team] != project for team, project in forbidden)
+
+
+def test_matches_brute_force_with_constraints():
+    rng = np.random.default_rng(5)
+    for _ in range(400):
+        team_count, project_count = rng.integers(1, 5), rng.integers(1, 4)
+        b_values = np.round(rng.random((team_count, project_count)) * 4) - 1
+        capacities = rng.integers(0, 3, size=project_count)
+        pairs = [(int(rng.integers(team_count)), int(rng.integers(project_count))) for _ in range(3)]
+        forced = pairs[:int(rng.integers(0, 2))]
+        forbidden = pairs[1:int(rng.integers(1, 4))]
+        allow_unassigned = bool(rng.integers(0, 2))
+
+        expected = brute_force(b_values, forced, forbidden, capacities, allow_unassigned)
+        result = solve_allocation(b_values, forced, forbidden, capacities, allow_unassigned)
+        if expected is None:
+            assert not result.feasible
+            continue
+        assert result.feasible
+        check_constraints(result, forced, forbidden, capacities)
+        assert result.objective == pytest.approx(expected)
+
+
+def test_matches_linear_sum_assignment():
+    rng = np.random.default_rng(6)
+    for team_count, project_count in ((30, 30), (25, 40), (60, 20)):
+        b_values = rng.random((team_count, project_count))
+        capacities = np.full(project_count, -(-team_count // project_count))
+        rows, columns = linear_sum_assignment(np.repeat(b_values, capacities, axis=1), maximize=True)
+        expected = np.repeat(b_values, capacities, axis=1)[rows, columns].sum()
+        result = solve_allocation(b_values, capacities=capacities)
+        assert result.feasible
+        check_constraints(result, (), (), capacities)
+        assert result.objective == pytest.approx(expected)
+
+
+def test_forced_and_forbidden_pairs_against_linear_sum_assignment():
+    rng = np.random.default_rng(7)
+    b_values = rng.random((20, 20))
+    forced = [(0, 3), (5, 3), (7, 11)]
+    forbidden = [(1, 0), (2, 1), (3, 2), (4, 5)]
+    capacities = np.full(20, 2)
+    result = solve_allocation(b_values, forced, forbidden, capacities)
+
+    # Forced teams removed with their places, forbidden pairs priced out
+    cost = b_values.copy()
+    cost[tuple(zip(*forbidden))] = -1e6
+    remaining = capacities - np.bincount([project for _, project in forced], minlength=20)
+    free = np.setdiff1d(np.arange(20), [team for team, _ in forced])
+    expanded = np.repeat(cost[free], remaining, axis=1)
+    rows, columns = linear_sum_assignment(expanded, maximize=True)
+    expected = expanded[rows, columns].sum() + sum(b_values[team, project] for team, project in forced)
+
+    check_constraints(result, forced, forbidden, capacities)
+    assert result.objective == pytest.approx(expected)
+
+
+def test_infeasible_constraints():
+    b_values = np.ones((3, 2))
+    assert not solve_allocation(b_values).feasible
+    assert solve_allocation(b_values, allow_unassigned=True).feasible
+    assert not solve_allocation(b_values, forced=[(0, 1)], forbidden=[(0, 1)], allow_unassigned=True).feasible
+    assert not solve_allocation(b_values, forced=[(0, 1), (1, 1)], allow_unassigned=True).feasible
+    # Every place of a team forbidden, with finite b values
+    assert not solve_allocation(b_values, forbidden=[(0, 0), (0, 1)], allow_unassigned=False,
+                                capacities=[3, 3]).feasible
+
+
+def test_non_finite_b_values_are_rejected():
+    b_values = np.ones((3, 4))
+    b_values[1, 2] = np.nan
+    b_values[2, 0] = np.inf
+    with pytest.raises(ValueError, match=r"2 non-finite entries at \(team, project\) \(1, 2\), \(2, 0\)"):
+        solve_allocation(b_values, allow_unassigned=True)
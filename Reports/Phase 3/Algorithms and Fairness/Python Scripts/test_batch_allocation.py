@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+from openpyxl import Workbook
+
+import batch_allocation
+from allocator import INFEASIBLE, OPTIMAL
+from batch_allocation import ALLOCATORS, allocate_cohort, run_batch
+
+
+def write_workbook(path, team_count=3, project_count=3, bad_cell=None):
+    # impact/fit/pref workbook of ones, ``bad_cell`` replaces the first fit cell
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for sheet in ("impact", "fit", "pref"):
+        worksheet = workbook.create_sheet(sheet)
+        worksheet.append(["team", "name"] + [f"P{project}" for project in range(project_count)])
+        worksheet.append([""] * (project_count + 2))
+        for team in range(team_count):
+            row = [1.0] * project_count
+            if sheet == "fit" and team == 0 and bad_cell is not None:
+                row[0] = bad_cell
+            worksheet.append([f"T{team}", f"Team {team}"] + row)
+    workbook.save(path)
+
+
+def test_malformed_workbooks_become_error_rows(tmp_path):
+    write_workbook(tmp_path / "good.xlsx")
+    write_workbook(tmp_path / "text.xlsx", bad_cell="high")
+    (tmp_path / "garbage.xlsx").write_bytes(b"not a workbook")
+    workbook = Workbook()
+    workbook.active.title = "scores"
+    workbook.save(tmp_path / "sheets.xlsx")
+
+    results = run_batch(str(tmp_path), processes=1, use_cache=False)
+    errors = results[results["status"] == "error"].set_index("cohort")["error"]
+    assert sorted(errors.index) == ["garbage", "sheets", "text"]
+    assert "fit!C3" in errors["text"] and "'high'" in errors["text"]
+    assert "Unrecognised sheets ['scores']" in errors["sheets"]
+    good = results[results["cohort"] == "good"]
+    assert len(good) == 3 and (good["status"] == "optimal").all()
+
+
+def _die_on_crash(filename, *arguments):
+    # Stands in for allocate_cohort in the workers, the "crash" cohort kills its process
+    if os.path.basename(filename).startswith("crash"):
+        os._exit(1)
+    return allocate_cohort(filename, *arguments)
+
+
+def test_dead_worker_becomes_error_row(tmp_path, monkeypatch):
+    for name in ("crash", "a", "b"):
+        write_workbook(tmp_path / f"{name}.xlsx")
+    monkeypatch.setattr(batch_allocation, "allocate_cohort", _die_on_crash)
+
+    results = run_batch(str(tmp_path), processes=2, use_cache=False)
+    # Every cohort is reported once, the one that killed the pool as an error
+    assert sorted(results["cohort"].unique()) == ["a", "b", "crash"]
+    crash = results[results["cohort"] == "crash"]
+    assert len(crash) == 1 and crash["status"].item() == "error"
+    assert crash["error"].item().startswith("Worker process died")
+
+
+def test_stable_reports_unassigned_teams():
+    # Both teams only accept project 0
+    b_values = np.array([[1.0, 0.0], [2.0, 0.0]])
+    assignment, _, exitflag, status = ALLOCATORS["stable"](b_values, None, False)
+    np.testing.assert_array_equal(assignment, [-1, 0])
+    assert exitflag == INFEASIBLE and status == "stable, 1 teams unassigned"
+    assert ALLOCATORS["stable"](b_values, None, True)[2:] == (OPTIMAL, "stable")
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from scipy.sparse.csgraph import connected_components
+
+from contention_graph import threshold_adjacency, threshold_sweep
+
+
+@pytest.mark.parametrize("strict", [False, True])
+def test_sweep_matches_a_graph_per_threshold(strict):
+    rng = np.random.default_rng(16)
+    for _ in range(20):
+        team_count = int(rng.integers(2, 40))
+        shape = (team_count, team_count)
+        # Float overlaps over very different scales, swept at exactly the edge
+        # weights and just above them
+        overlap = rng.random(shape) * rng.choice([1e-6, 1, 1e6]) * (rng.random(shape) < 0.3)
+        weights = np.maximum(overlap, overlap.T)[np.triu_indices(team_count, 1)]
+        thresholds = np.unique(weights[weights > 0])
+        thresholds = np.concatenate((thresholds, np.nextafter(thresholds, np.inf), [0.0]))
+
+        sweep = threshold_sweep(overlap, thresholds, strict)
+        for index, threshold in enumerate(thresholds):
+            adjacency = threshold_adjacency(overlap, threshold, strict)
+            count, labels = connected_components(adjacency, directed=False)
+            assert sweep.edge_count[index] == adjacency.nnz // 2
+            assert sweep.components[index] == count
+            assert sweep.largest_component[index] == np.bincount(labels).max()
+            assert sweep.isolated[index] == np.count_nonzero(np.diff(adjacency.indptr) == 0)
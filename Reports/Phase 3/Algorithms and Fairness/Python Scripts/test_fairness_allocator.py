@@ -0,0 +1,95 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import fairness_allocator
+from allocator import _infeasible
+from fairness_allocator import solve_fair_allocation
+from team_statistics import normalize_non_zero
+
+
+def brute_force(b_values, forced, forbidden, capacities, allow_unassigned):
+    # Best (bottleneck, total) over every feasible allocation, with
+    # allow_unassigned the number of allocated teams comes first. None when
+    # nothing is feasible
+    team_count, project_count = b_values.shape
+    normalized = normalize_non_zero(b_values)[0]
+    options = list(range(project_count)) + ([-1] if allow_unassigned else [])
+    forced, forbidden = dict(forced), set(forbidden)
+    best = None
+    for assignment in itertools.product(options, repeat=team_count):
+        if any(assignment[team] != project for team, project in forced.items()):
+            continue
+        if any((team, project) in forbidden for team, project in enumerate(assignment)):
+            continue
+        pairs = [(team, project) for team, project in enumerate(assignment) if project >= 0]
+        if np.any(np.bincount([project for _, project in pairs], minlength=project_count) > capacities):
+            continue
+        # An empty allocation has no bottleneck, it ranks above every value
+        bottleneck = min((normalized[pair] for pair in pairs), default=np.inf)
+        key = (bottleneck, sum(b_values[pair] for pair in pairs))
+        if allow_unassigned:
+            key = (len(pairs),) + key
+        best = key if best is None else max(best, key)
+    return best
+
+
+@pytest.mark.parametrize("allow_unassigned", [False, True])
+def test_bottleneck_matches_brute_force(allow_unassigned):
+    rng = np.random.default_rng(24 + allow_unassigned)
+    for _ in range(300):
+        team_count, project_count = rng.integers(0, 5), rng.integers(1, 5)
+        shape = (team_count, project_count)
+        b_values = np.round(rng.random(shape) * 3) * (rng.random(shape) < 0.7)
+        capacities = rng.integers(0, 3, size=project_count)
+        forced = [(int(rng.integers(team_count)), int(rng.integers(project_count)))] \
+            if team_count and rng.random() < 0.3 else []
+        forbidden = [(int(rng.integers(team_count)), int(rng.integers(project_count)))] \
+            if team_count and rng.random() < 0.3 else []
+        expected = brute_force(b_values, forced, forbidden, capacities, allow_unassigned)
+
+        for tie_break in (True, False):
+            result = solve_fair_allocation(b_values, forced, forbidden, capacities, allow_unassigned, tie_break)
+            if expected is None:
+                assert not result.feasible
+                continue
+            assert result.feasible
+            assignment = result.assignment
+            allocated = np.flatnonzero(assignment >= 0)
+            assert np.all(np.bincount(assignment[allocated], minlength=project_count) <= capacities)
+            assert all(assignment[team] == project for team, project in forced)
+            assert all(assignment[team] != project for team, project in forbidden)
+
+            reached = result.min_normalized if len(allocated) else np.inf
+            got = (reached, result.objective)
+            if allow_unassigned:
+                got = (len(allocated),) + got
+            # Without the tie-break only the bottleneck (and size) is optimal
+            compared = len(got) if tie_break else len(got) - 1
+            np.testing.assert_allclose(got[:compared], expected[:compared])
+
+
+def test_prefers_the_fairer_allocation():
+    # The optimal allocation gives team 1 its worst project, max-min does not
+    b_values = np.array([[10.0, 9.0], [10.0, 1.0]])
+    result = solve_fair_allocation(b_values)
+    np.testing.assert_array_equal(result.assignment, [1, 0])
+    assert result.min_normalized == pytest.approx(0.9)
+
+
+def test_non_finite_b_values_are_rejected():
+    b_values = np.ones((3, 3))
+    b_values[2, 1] = np.nan
+    with pytest.raises(ValueError, match=r"\(2, 1\)"):
+        solve_fair_allocation(b_values)
+
+
+def test_infeasible_tie_break_is_reported(monkeypatch):
+    # The tie-break solve's failure is passed up instead of an empty "optimal"
+    monkeypatch.setattr(fairness_allocator, "solve_allocation",
+                        lambda b_values, *args: _infeasible(len(b_values), 0.0, "no tie-break"))
+    result = solve_fair_allocation(np.eye(3))
+    assert not result.feasible
+    assert result.status == "no tie-break"
+    assert solve_fair_allocation(np.eye(3), tie_break=False).feasible
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from allocator import solve_allocation
+from incremental_allocator import IncrementalAllocator
+
+
+@pytest.mark.parametrize("allow_unassigned", [False, True])
+def test_edits_match_a_full_resolve(allow_unassigned):
+    rng = np.random.default_rng(11 + allow_unassigned)
+    for _ in range(30):
+        team_count, project_count = rng.integers(2, 12), rng.integers(2, 10)
+        b_values = np.round(rng.random((team_count, project_count)) * 5)
+        capacities = rng.integers(1, 3, size=project_count)
+        if not allow_unassigned and capacities.sum() < team_count:
+            capacities[0] += team_count - capacities.sum()
+        allocator = IncrementalAllocator(b_values, capacities, allow_unassigned)
+        forced, forbidden = {}, set()
+
+        for _ in range(25):
+            team, project = int(rng.integers(team_count)), int(rng.integers(project_count))
+            edit = rng.integers(4)
+            candidate_b_values = b_values
+            if edit == 0:
+                result = allocator.force(team, project)
+                candidate_forced, candidate_forbidden = {**forced, team: project}, forbidden
+            elif edit == 1:
+                result = allocator.forbid(team, project)
+                candidate_forced, candidate_forbidden = forced, forbidden | {(team, project)}
+            elif edit == 2:
+                result = allocator.release(team, project)
+                candidate_forced = {key: value for key, value in forced.items()
+                                    if (key, value) != (team, project)}
+                candidate_forbidden = forbidden - {(team, project)}
+            else:
+                candidate_b_values = b_values.copy()
+                candidate_b_values[team] = np.round(rng.random(project_count) * 5)
+                result = allocator.update_team(team, candidate_b_values[team])
+                candidate_forced, candidate_forbidden = forced, forbidden
+
+            expected = solve_allocation(candidate_b_values, list(candidate_forced.items()),
+                                        sorted(candidate_forbidden), capacities, allow_unassigned)
+            assert result.feasible == expected.feasible
+            if result.feasible:
+                b_values, forced, forbidden = candidate_b_values, candidate_forced, candidate_forbidden
+                assert result.objective == pytest.approx(expected.objective)
+                assignment = result.assignment
+                assert all(assignment[key] == value for key, value in forced.items())
+                assert all(assignment[key] != value for key, value in forbidden)
+                allocated = assignment[assignment >= 0]
+                assert np.all(np.bincount(allocated, minlength=project_count) <= capacities)
+
+            # A rejected edit leaves the previous optimum in place
+            current = solve_allocation(b_values, list(forced.items()), sorted(forbidden),
+                                       capacities, allow_unassigned)
+            assert allocator.result().objective == pytest.approx(current.objective)
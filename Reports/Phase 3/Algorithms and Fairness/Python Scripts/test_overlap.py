@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from overlap import normalize_b_values, overlap_percentages, top_fraction
+from team_statistics import descending_order
+
+
+def reference_top(b_values, divisor, ranked):
+    # Per-team loop ranking with the stable descending order
+    normalized = normalize_b_values(b_values)
+    top = []
+    for row in normalized:
+        candidates = np.flatnonzero(row > 0)
+        chosen = candidates[descending_order(row[candidates])][:len(candidates) // divisor]
+        top.append(chosen if ranked else np.sort(chosen))
+    return top
+
+
+@pytest.mark.parametrize("divisor", [2, 5])
+@pytest.mark.parametrize("ranked", [False, True])
+def test_top_fraction_tied_rows(divisor, ranked):
+    rng = np.random.default_rng(18)
+    for _ in range(200):
+        # Small integer b values, so most rows have ties at the kept boundary
+        b_values = rng.integers(0, 4, size=(rng.integers(1, 10), rng.integers(1, 12))).astype(float)
+        expected = reference_top(b_values, divisor, ranked)
+        for matrix in (b_values, sparse.csr_matrix(b_values)):
+            top = top_fraction(matrix, divisor, ranked=ranked)
+            for team, projects in enumerate(expected):
+                np.testing.assert_array_equal(top[team], projects)
+
+
+def test_top_fraction_ties_keep_higher_project_ids():
+    b_values = np.array([[1.0, 1.0, 1.0, 1.0], [2.0, 1.0, 1.0, 0.0]])
+    top = top_fraction(b_values, divisor=2, ranked=True)
+    np.testing.assert_array_equal(top[0], [3, 2])
+    np.testing.assert_array_equal(top[1], [0])
+
+
+def test_overlap_percentages_tied_rows():
+    rng = np.random.default_rng(2)
+    b_values = rng.integers(0, 3, size=(12, 9)).astype(float)
+    top = reference_top(b_values, 2, False)
+    overlap = overlap_percentages(top_fraction(b_values, 2))
+    for i, mine in enumerate(top):
+        for j, theirs in enumerate(top):
+            expected = 0 if i == j or len(mine) == 0 else len(np.intersect1d(mine, theirs)) / len(mine) * 100
+            assert overlap[i, j] == pytest.approx(expected)
+    np.testing.assert_allclose(overlap_percentages(top_fraction(b_values, 2), backend="sparse").toarray(), overlap)
@@ -0,0 +1,13 @@
+import pandas as pd
+
+from scenarios import run_scenarios, scenario_grid
+from synthetic_cohort import generate_cohort
+
+
+def test_sparse_cohort_matches_dense():
+    data = generate_cohort(40, 30, seed=13, impact_density=0.2)
+    scenarios = scenario_grid(alphas=(1, 2), pref_scalars=(0.1, 0.5))
+    expected = run_scenarios(data, scenarios, processes=1, allow_unassigned=True).drop(columns="runtime")
+    for processes in (1, 2):
+        results = run_scenarios(data.to_sparse(), scenarios, processes=processes, allow_unassigned=True)
+        pd.testing.assert_frame_equal(results.drop(columns="runtime"), expected)
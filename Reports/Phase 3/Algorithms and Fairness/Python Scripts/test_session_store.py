@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from session_store import ALLOCATE, EVENT_DTYPE, FORBID, PIN, RELEASE, REMOVE, SessionStore, replay
+
+
+def loop_replay(events, team_count):
+    # One event at a time, the edits as IncrementalAllocator applies them
+    assignment = np.full(team_count, -1)
+    pinned = np.full(team_count, -1)
+    forbidden = set()
+    for kind, team, project in zip(events["kind"], events["team"], events["project"]):
+        if kind == ALLOCATE:
+            assignment[team] = project
+        elif kind == REMOVE:
+            assignment[team] = -1
+        elif kind == PIN:
+            pinned[team] = project
+        elif kind == FORBID:
+            forbidden.add((team, project))
+        elif kind == RELEASE:
+            if pinned[team] == project:
+                pinned[team] = -1
+            forbidden.discard((team, project))
+    return assignment, pinned, forbidden
+
+
+def random_events(rng, count, team_count, project_count):
+    events = np.zeros(count, dtype=EVENT_DTYPE)
+    events["time"] = np.arange(count)
+    events["kind"] = rng.integers(ALLOCATE, RELEASE + 1, size=count)
+    events["team"] = rng.integers(0, team_count, size=count)
+    events["project"] = np.where(events["kind"] == REMOVE, -1, rng.integers(0, project_count, size=count))
+    return events
+
+
+def assert_state(state, expected):
+    assignment, pinned, forbidden = expected
+    np.testing.assert_array_equal(state.assignment, assignment)
+    np.testing.assert_array_equal(state.pinned, pinned)
+    assert set(map(tuple, state.forbidden.tolist())) == forbidden
+
+
+def test_replay_matches_loop():
+    rng = np.random.default_rng(25)
+    for _ in range(300):
+        team_count, project_count = rng.integers(1, 8), rng.integers(1, 6)
+        events = random_events(rng, rng.integers(0, 60), team_count, project_count)
+        for upto in (len(events), len(events) // 2):
+            assert_state(replay(events[:upto], team_count, project_count),
+                         loop_replay(events[:upto], team_count))
+
+
+def test_reopen_and_torn_record(tmp_path):
+    rng = np.random.default_rng(3)
+    path = str(tmp_path / "cohort.session")
+    b_values = rng.random((6, 4)).astype(np.float32)
+    events = random_events(rng, 40, 6, 4)
+    with SessionStore.create(path, b_values, matrices={"impact": b_values * 2}, metadata={"alpha": 1}) as store:
+        for event in events[:30]:
+            store.record(int(event["kind"]), int(event["team"]), int(event["project"]), float(event["time"]))
+        store.record_many(events["kind"][30:], events["team"][30:], events["project"][30:], timestamp=30.0)
+
+    # A crash in the middle of an append leaves part of a record behind
+    with open(path, "ab") as handle:
+        handle.write(b"\x01\x02\x03")
+    with SessionStore.open(path) as store:
+        assert len(store) == 40
+        assert store.b_values.dtype == np.float32
+        np.testing.assert_array_equal(store.b_values, b_values)
+        np.testing.assert_array_equal(store.matrices["impact"], b_values * 2)
+        assert store.metadata == {"alpha": 1}
+        assert_state(store.state(), loop_replay(events, 6))
+        # The next append overwrites the torn bytes
+        store.allocate(0, 3, timestamp=40.0)
+        log_end = store.log_offset + 41 * EVENT_DTYPE.itemsize
+
+    with SessionStore.open(path, writable=False) as store:
+        assert len(store) == 41
+        assert_state(store.state(), loop_replay(store.events, 6))
+        assert store.state().assignment[0] == 3
+        with pytest.raises(ValueError):
+            store.remove(0)
+    with open(path, "rb") as handle:
+        assert len(handle.read()) == log_end
+
+
+def test_solve_logs_only_changes(tmp_path):
+    rng = np.random.default_rng(4)
+    with SessionStore.create(str(tmp_path / "solve.session"), rng.random((8, 8))) as store:
+        store.pin(0, 5)
+        store.forbid(1, 3)
+        result = store.solve()
+        assert result.feasible
+        state = store.state()
+        np.testing.assert_array_equal(state.assignment, result.assignment)
+        assert state.assignment[0] == 5 and state.assignment[1] != 3
+        logged = len(store)
+        store.solve()
+        assert len(store) == logged
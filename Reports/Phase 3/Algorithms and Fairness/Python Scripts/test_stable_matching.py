@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from stable_matching import gale_shapley
+
+
+def blocking_pairs(b_values, capacities, assignment):
+    # (team, project) pairs that would both rather be matched to each other.
+    # Teams only accept positive b values and projects rank teams by
+    # (b value, -team), as in gale_shapley
+    team_count, project_count = b_values.shape
+    pairs = []
+    for team in range(team_count):
+        current = assignment[team]
+        for project in np.flatnonzero(b_values[team] > 0):
+            if current >= 0 and b_values[team, project] <= b_values[team, current]:
+                continue
+            held = np.flatnonzero(assignment == project)
+            if len(held) < capacities[project]:
+                pairs.append((team, project))
+            elif any((b_values[team, project], -team) > (b_values[other, project], -other) for other in held):
+                pairs.append((team, project))
+    return pairs
+
+
+@pytest.mark.parametrize("with_capacities", [False, True])
+def test_allocation_is_stable(with_capacities):
+    rng = np.random.default_rng(3 + with_capacities)
+    for _ in range(300):
+        team_count, project_count = rng.integers(1, 12), rng.integers(1, 8)
+        # Rounded values give plenty of ties and zeros
+        shape = (team_count, project_count)
+        b_values = np.round(rng.random(shape) * 4) * (rng.random(shape) < 0.8)
+        capacities = rng.integers(0, 4, size=project_count) if with_capacities else np.ones(project_count, dtype=int)
+        result = gale_shapley(b_values, capacities if with_capacities else None)
+        assignment = result.assignment
+
+        allocated = np.flatnonzero(assignment >= 0)
+        assert np.all(b_values[allocated, assignment[allocated]] > 0)
+        assert np.all(np.bincount(assignment[allocated], minlength=project_count) <= capacities)
+        assert result.objective == pytest.approx(b_values[allocated, assignment[allocated]].sum())
+        assert blocking_pairs(b_values, capacities, assignment) == []
+
+
+def test_team_proposing_optimum():
+    # Both teams like project 0 best, project 0 prefers team 1
+    b_values = np.array([[3.0, 1.0], [4.0, 2.0]])
+    np.testing.assert_array_equal(gale_shapley(b_values).assignment, [1, 0])
@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class ImpactScores(object):
+    """Goodness and impact of every well-formed allocation.
+
+    ``goodness[k]`` is the b value of allocation k and ``impact[k]`` sums, over
+    the allocations of other teams to the same project with a positive b value,
+    how much better that pairing was (``b_other - goodness``). ``rows`` holds
+    the positions of the scored allocations in the input, ``malformed`` the
+    positions of allocations whose team or project could not be looked up.
+    """
+
+    def __init__(self, goodness, impact, rows, malformed):
+        self.goodness = goodness
+        self.impact = impact
+        self.rows = rows
+        self.malformed = malformed
+
+    @property
+    def malformed_count(self):
+        return len(self.malformed)
+
+    def __repr__(self):
+        return f"ImpactScores(scored={len(self.rows)}, malformed={self.malformed_count})"
+
+
+def score_allocations(teams, projects, lookup):
+    """Goodness and impact on the remaining teams for a list of allocations.
+
+    ``teams`` and ``projects`` are parallel arrays of ids and ``lookup`` returns
+    their b values and validity, e.g. ``BValueTable.lookup``. Allocations are
+    grouped by project and by (project, team) once, so the impact of every
+    allocation comes from the group sums in a single pass instead of comparing
+    every pair.
+    """
+    teams = np.asarray(teams, dtype=np.float64)
+    projects = np.asarray(projects, dtype=np.float64)
+    goodness, valid = lookup(teams, projects)
+    valid &= ~np.isnan(goodness)
+
+    rows = np.flatnonzero(valid)
+    goodness = goodness[rows]
+    teams, projects = teams[rows], projects[rows]
+
+    _, project_group = np.unique(projects, return_inverse=True)
+    _, pair_group = np.unique(np.column_stack((projects, teams)), axis=0, return_inverse=True)
+    project_group, pair_group = project_group.ravel(), pair_group.ravel()
+
+    # Sums over the positive b values of the project, minus those of the same
+    # team (the allocation itself and any repeat of it)
+    positive = goodness > 0
+    weights = np.where(positive, goodness, 0.0)
+    project_sum = np.bincount(project_group, weights=weights)[project_group]
+    project_count = np.bincount(project_group, weights=positive)[project_group]
+    pair_sum = np.bincount(pair_group, weights=weights)[pair_group]
+    pair_count = np.bincount(pair_group, weights=positive)[pair_group]
+
+    impact = (project_sum - pair_sum) - goodness * (project_count - pair_count)
+    return ImpactScores(goodness, impact, rows, np.flatnonzero(~valid))
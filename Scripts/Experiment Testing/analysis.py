@@ -2,31 +2,12 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import timedelta
 
-def parse_time_string(time_str):
-    if pd.isna(time_str):
-        return 0.0
-    try:
-        parts = time_str.split(':')
-        if len(parts) == 2:
-            minutes, seconds = map(int, parts)
-            return minutes * 60 + seconds
-        elif len(parts) == 3:
-            hours, minutes, seconds = map(int, parts)
-            return hours * 3600 + minutes * 60 + seconds
-    except ValueError:
-        return 0.0
-
-class Action(object):
-    def __init__(self, time, action, team=None, project=None, missing=False):
-        self.time = time
-        self.action = action
-        self.team = team
-        self.project = project
-        self.missing = missing
-
-    def __repr__(self):
-        return f"Action(time={self.time}, action={self.action}, team={self.team}, project={self.project}, missing={self.missing})\n"
-    
+# allocation_data is the Phase 3 workbook loader, run this script with
+# "Reports/Phase 3/Algorithms and Fairness/Python Scripts" on PYTHONPATH
+from allocation_data import load_allocation_data
+from allocation_impact import score_allocations
+from b_value_table import BValueTable
+from event_log import EventLogAnalyzer, marker_event, read_events
 
 #######################
 ## Read Pairing Data ##
@@ -35,62 +16,56 @@ class Action(object):
 alpha = 1 # capability scalar
 beta = 0.1 # preference scalar
 
-impact = pd.read_excel("IFB398 24se1 Project Allocation.xlsx", sheet_name="impact")
-capability = pd.read_excel("IFB398 24se1 Project Allocation.xlsx", sheet_name="fit")
-preference = pd.read_excel("IFB398 24se1 Project Allocation.xlsx", sheet_name="pref")
-
-impact_dict = impact.set_index('team_id').to_dict('index')
-capability_dict = capability.set_index('team_id').to_dict('index')
-preference_dict = preference.set_index('team_id').to_dict('index')
+allocation_data = load_allocation_data("IFB398 24se1 Project Allocation.xlsx")
 
-b_values = {}
-
-for team, impact_values in impact_dict.items():
-    b_values[team] = {}
-
-    for project in impact_values.keys():
-        if project != 'impact':
-            b_value = impact_values[project] * (alpha * capability_dict[team][project] + beta * preference_dict[team][project])
-            b_values[team][project] = b_value;
+b_values = BValueTable.from_allocation_data(allocation_data, alpha, beta)
 
 ##########################
 ## Read Experiment Data ##
 ##########################
 
-df = pd.read_excel("R Studio Experiment Data.xlsx")
-df['Time'] = df['Time'].apply(parse_time_string)
+# The log is streamed chunk by chunk. The analyzer and the actions per
+# allocation count below carry only running state between chunks, and of each
+# Allocate event just its team and project are kept for the impact scores, so
+# memory grows with the number of allocations, not the length of the log.
+analyzer = EventLogAnalyzer()
+analyzer.update(marker_event(0, "Allocate"))
 
-actions = [ Action(row["Time"], row["Action"], row["Team"], row["Project"], False if pd.isna(row["Missing"]) else True) for _, row in df.iterrows()]
-actions.insert(0, Action(0, "Allocate", None, None, False))
+# Actions taken in each cycle before its allocation, a cycle ends with an R
+# action. The session starts after the marker Allocate event.
+cycleStarted = True
+count = 1
+actionCounts = []
+
+allocation_chunks = []
+row = 0
+for chunk in read_events("R Studio Experiment Data.xlsx"):
+    analyzer.update(chunk)
+    for action, team, project in zip(chunk["action"], chunk["team"], chunk["project"]):
+        if cycleStarted:
+            if action == "Allocate":
+                cycleStarted = False
+                actionCounts.append((count, team, project))
+            else:
+                count = count + 1
+        else:
+            if action == "R":
+                cycleStarted = True
+                count = 0
+    allocations = chunk.loc[chunk["action"] == "Allocate", ["team", "project"]]
+    # Row numbers across the whole log, for the malformed allocation report
+    allocation_chunks.append(allocations.set_axis(allocations.index + row))
+    row += len(chunk)
+summary = analyzer.summary()
 
-allocations = [action for action in actions if action.action == 'Allocate']
-removals = [action for action in actions if action.action == 'Remove']
-graphs = [action for action in actions if action.action == 'Graph']
-spreadsheets = [action for action in actions if action.action == 'Spreadsheet']
-r = [action for action in actions if action.action == 'R']
-data = [action for action in actions if action.action == 'Data']
-missing_times = [action.time for action in actions if action.missing]
+missing_times = summary.missing_times
 
 ####################
 ## BURNDOWN CHART ##
 ####################
 
-events = []
-for action in allocations:
-    events.append((action.time, 1))
-for action in removals:
-    events.append((action.time, -1))
-
-events.sort(key=lambda x: x[0])
-
-time_points = []
-remaining_allocations = []
-remaining = 0
-
-for time_point, delta in events:
-    time_points.append(time_point)
-    remaining += delta
-    remaining_allocations.append(remaining)
+time_points = summary.time_points
+remaining_allocations = summary.remaining
 
 max_remaining = max(remaining_allocations, default=0)
 
@@ -98,87 +73,31 @@ max_remaining = max(remaining_allocations, default=0)
 #######################
 ## Spreadsheet Times ##
 #######################
-spreadsheets2 = spreadsheets.copy()
-spreadsheet_times = [action.time for action in spreadsheets2]
-r_times = []
-time_diffs = []
-
-last_spreadsheet_time = None
+r_times = summary.latency_times
+time_diffs = summary.latencies
 
-last_spreadsheet_time = None
-
-for action in r:
-    if last_spreadsheet_time is not None:
-        time_diffs.append(action.time - last_spreadsheet_time)
-        r_times.append(action.time)
-        last_spreadsheet_time = None
-    if spreadsheets2:
-        last_spreadsheet_time = spreadsheets2.pop(0).time
-
-
-##########################
-## Time per Action Type ##
-##########################
-
-allocateTime = 0
-removeTime = 0
-spreadsheetTime = 0
-graphTime = 0
-Rtime = 0
-dataTime = 0
-
-for i in range(0,len(actions)-1):
-    if actions[i].action == "Allocate":
-        allocateTime = allocateTime + (actions[i+1].time - actions[i].time)
-    elif actions[i].action == "Remove":
-        removeTime = removeTime + (actions[i+1].time - actions[i].time)
-    elif actions[i].action == "Graph":
-        graphTime = graphTime + (actions[i+1].time - actions[i].time)
-    elif actions[i].action == "Spreadsheet":
-        spreadsheetTime = spreadsheetTime + (actions[i+1].time - actions[i].time)
-    elif actions[i].action == "R":
-        Rtime = Rtime + (actions[i+1].time - actions[i].time)
-    elif actions[i].action == "Data":
-        dataTime = dataTime + (actions[i+1].time - actions[i].time)
 
 ###############################
 ## Impact on remaining teams ##
 ###############################
-goodness_scores = []
-impact_scores = []
-for action in allocations[1:]:
-    try:
-        goodness = b_values[f"T{int(action.team)}"][f"P{int(action.project)}"]
-        goodness_scores.append(goodness)
-        
-        impact = 0
-        for other_action in allocations[1:]:
-            if other_action.team != action.team and other_action.project == action.project:
-                potential_b_value = b_values[f"T{int(other_action.team)}"][f"P{int(other_action.project)}"]
-                if potential_b_value > 0:
-                    impact += (potential_b_value - goodness)
-        impact_scores.append(impact)
-    except:
-        pass
+allocation_events = (pd.concat(allocation_chunks) if allocation_chunks
+                     else pd.DataFrame(columns=["team", "project"]))
+scores = score_allocations(allocation_events["team"], allocation_events["project"],
+                           b_values.lookup)
+if scores.malformed_count:
+    print(f"Skipped {scores.malformed_count} allocation(s) with an unknown team or project: "
+          f"rows {allocation_events.index[scores.malformed].tolist()}")
+
+goodness_scores = scores.goodness
+impact_scores = scores.impact
 
 ######################
 ## Actions vs Score ##
 ######################
 
-cycleStarted = True
-count = 1
-actionScore = []
-for action in actions[1:]:
-    if cycleStarted:
-        if action.action == "Allocate":
-            cycleStarted = False
-            actionScore.append((count, b_values[f"T{int(action.team)}"][f"P{int(action.project)}"], action.team, action.project))
-        else:
-            count = count + 1
-    else:
-        if action.action == "R":
-            cycleStarted = True
-            count = 0
+counts, teams, projects = zip(*actionCounts) if actionCounts else ((), (), ())
+scored_b_values, _ = b_values.lookup(teams, projects)
+actionScore = list(zip(counts, scored_b_values, teams, projects))
 
 ###############
 ## PLOT DATA ##
@@ -221,8 +140,8 @@ plt.show()
 ## Time per action ##
 #####################
 action_labels = ['Allocate', 'Remove', 'Spreadsheet', 'Graph', 'R', 'Data']
-total_times = [allocateTime, removeTime, spreadsheetTime, graphTime, Rtime, dataTime]
-average_times = [allocateTime/len(allocations), removeTime/len(removals), spreadsheetTime/len(spreadsheets), graphTime/len(graphs), Rtime/len(r), dataTime/len(data)]
+total_times = [summary.totals[action] for action in action_labels]
+average_times = [summary.averages[action] for action in action_labels]
 fig,ax = plt.subplots()
 bar_width = 0.35
 index = range(6)
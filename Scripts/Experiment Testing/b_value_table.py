@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+
+def _numeric_ids(names):
+    # "T215"/"P202" style labels to their numeric ids, NaN when there is none
+    extracted = pd.Series(names, dtype="string").str.extract(r"(\d+)\s*$")[0]
+    return pd.to_numeric(extracted, errors="coerce").to_numpy(dtype=np.float64)
+
+
+class BValueTable(object):
+    """Teams x projects b values in one contiguous array with id index maps.
+
+    Teams and projects can be addressed by their labels ("T215", "P202") or by
+    the numeric ids the experiment logs record (215, 202). ``lookup`` resolves
+    whole arrays of (team, project) pairs at once.
+    """
+
+    def __init__(self, values, team_names, project_names):
+        self.values = np.ascontiguousarray(values)
+        self.team_names = np.asarray(team_names).astype(str)
+        self.project_names = np.asarray(project_names).astype(str)
+        if self.values.shape != (len(self.team_names), len(self.project_names)):
+            raise ValueError("values must have one row per team and one column per project")
+
+        self._team_labels = pd.Index(self.team_names)
+        self._project_labels = pd.Index(self.project_names)
+        self._team_ids = pd.Index(_numeric_ids(self.team_names))
+        self._project_ids = pd.Index(_numeric_ids(self.project_names))
+
+    @classmethod
+    def from_matrices(cls, impact, capability, preference, team_names, project_names,
+                      alpha=1, beta=0.1, dtype=np.float64):
+        # b = impact * (alpha * fit + beta * pref), computed as one array expression
+        scalar = np.dtype(dtype).type
+        impact, capability, preference = (np.asarray(m, dtype=dtype) for m in (impact, capability, preference))
+        return cls(impact * (scalar(alpha) * capability + scalar(beta) * preference), team_names, project_names)
+
+    @classmethod
+    def from_allocation_data(cls, data, alpha=1, beta=0.1, dtype=np.float64):
+        return cls.from_matrices(data.impact, data.capability, data.preference,
+                                 data.team_names, data.project_names, alpha, beta, dtype)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def _indexer(self, keys, labels, ids):
+        keys = np.asarray(keys)
+        if keys.dtype.kind in "OUS":
+            return labels.get_indexer(keys.astype(str))
+        return ids.get_indexer(keys.astype(np.float64))
+
+    def team_index(self, teams):
+        # Row of every team label or numeric id, -1 when unknown
+        return self._indexer(teams, self._team_labels, self._team_ids)
+
+    def project_index(self, projects):
+        # Column of every project label or numeric id, -1 when unknown
+        return self._indexer(projects, self._project_labels, self._project_ids)
+
+    def lookup(self, teams, projects):
+        """b values of many (team, project) pairs.
+
+        Returns ``(values, valid)``, ``valid`` is False (and the value NaN) where
+        the team or project is missing or unknown.
+        """
+        rows = self.team_index(np.atleast_1d(teams))
+        columns = self.project_index(np.atleast_1d(projects))
+        valid = (rows >= 0) & (columns >= 0)
+        values = np.full(valid.shape, np.nan, dtype=self.values.dtype)
+        values[valid] = self.values[rows[valid], columns[valid]]
+        return values, valid
+
+    def __getitem__(self, pair):
+        team, project = pair
+        values, valid = self.lookup([team], [project])
+        if not valid[0]:
+            raise KeyError(pair)
+        return values[0]
+
+    def __repr__(self):
+        return f"BValueTable(teams={self.shape[0]}, projects={self.shape[1]}, dtype={self.values.dtype})"
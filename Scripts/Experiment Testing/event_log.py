@@ -0,0 +1,240 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+ACTION_TYPES = ("Allocate", "Remove", "Spreadsheet", "Graph", "R", "Data")
+EVENT_COLUMNS = ("time", "action", "team", "project", "missing")
+
+
+def parse_times(times):
+    # Vectorised parse_time_string: "m:ss" or "h:mm:ss" strings, or plain seconds
+    times = pd.Series(times)
+    numeric = pd.to_numeric(times, errors="coerce")
+    parts = times.astype("string").str.split(":", expand=True)
+    if parts.shape[1] < 2:
+        return numeric.fillna(0.0).to_numpy(dtype=np.float64)
+
+    parts = parts.apply(pd.to_numeric, errors="coerce")
+    count = parts.notna().sum(axis=1)
+    seconds = np.where(count == 2, parts[0] * 60 + parts[1], np.nan)
+    if parts.shape[1] > 2:
+        seconds = np.where(count == 3, parts[0] * 3600 + parts[1] * 60 + parts[2], seconds)
+    seconds = np.where(np.isnan(seconds), numeric, seconds)
+    return np.nan_to_num(seconds.astype(np.float64), nan=0.0)
+
+
+def normalize_events(frame):
+    # Typed event columns from a raw Time/Action/Team/Project/Missing frame
+    columns = {str(column).strip().lower(): column for column in frame.columns}
+    missing = columns.get("missing")
+    return pd.DataFrame({
+        "time": parse_times(frame[columns["time"]].to_numpy()),
+        "action": frame[columns["action"]].astype("string").str.strip().to_numpy(dtype=object),
+        "team": pd.to_numeric(frame[columns["team"]], errors="coerce").to_numpy(dtype=np.float64)
+        if "team" in columns else np.full(len(frame), np.nan),
+        "project": pd.to_numeric(frame[columns["project"]], errors="coerce").to_numpy(dtype=np.float64)
+        if "project" in columns else np.full(len(frame), np.nan),
+        "missing": frame[missing].notna().to_numpy() if missing is not None else np.zeros(len(frame), dtype=bool),
+    })
+
+
+def _read_xlsx_chunks(path, chunksize, sheet_name=None):
+    # openpyxl read-only mode streams rows without loading the whole sheet
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) == chunksize:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+
+def read_events(path, chunksize=100000, sheet_name=None):
+    """Yields typed event chunks of at most ``chunksize`` rows from a log file.
+
+    Excel (``.xlsx``), CSV and JSON lines (``.jsonl``/``.ndjson``) logs are
+    supported. Every chunk has the columns of ``EVENT_COLUMNS`` with times in
+    seconds and ``missing`` as a boolean.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        chunks = _read_xlsx_chunks(path, chunksize, sheet_name)
+    elif extension == ".csv":
+        chunks = pd.read_csv(path, chunksize=chunksize)
+    elif extension in (".jsonl", ".ndjson"):
+        chunks = pd.read_json(path, lines=True, chunksize=chunksize)
+    else:
+        raise ValueError(f"Unsupported event log format '{extension}'")
+
+    for chunk in chunks:
+        yield normalize_events(chunk)
+
+
+class EventLogSummary(object):
+    """Results of an event log analysis.
+
+    ``time_points``/``remaining`` are the burndown series (running count of
+    allocations minus removals), ``totals``/``counts``/``averages`` are keyed by
+    action type and ``latencies`` holds the time from each Spreadsheet action to
+    the R action that follows it, at ``latency_times``.
+    """
+
+    def __init__(self, time_points, remaining, totals, counts, latencies, latency_times,
+                 missing_times, event_count):
+        self.time_points = time_points
+        self.remaining = remaining
+        self.totals = totals
+        self.counts = counts
+        self.latencies = latencies
+        self.latency_times = latency_times
+        self.missing_times = missing_times
+        self.event_count = event_count
+
+    @property
+    def averages(self):
+        return {action: self.totals[action] / self.counts[action] if self.counts[action] else 0.0
+                for action in self.totals}
+
+
+class EventLogAnalyzer(object):
+    """Incremental analytics over chronologically ordered action events.
+
+    Feed typed chunks (see ``read_events``) to ``update`` and call ``summary``
+    at any point. Each chunk is processed with array operations, and only the
+    last event and the running totals are carried between chunks, so memory is
+    bounded by the chunk size plus the size of the output series.
+
+    The dwell time of an event is the time until the next event, the last event
+    of the log has none.
+    """
+
+    def __init__(self, action_types=ACTION_TYPES):
+        self.codes = {action: code for code, action in enumerate(action_types)}
+        self.totals = np.zeros(len(self.codes))
+        self.counts = np.zeros(len(self.codes), dtype=np.int64)
+        self.event_count = 0
+        self.remaining = 0
+        self.last_time = None
+        self.last_code = None
+        self.pending_spreadsheet = None
+        self.series_times = []
+        self.series_remaining = []
+        self.latencies = []
+        self.latency_times = []
+        self.missing_times = []
+
+    def _encode(self, actions):
+        # New action types get codes as they appear
+        for action in pd.unique(actions):
+            if action not in self.codes and isinstance(action, str):
+                self.codes[action] = len(self.codes)
+        if len(self.codes) > len(self.totals):
+            grow = len(self.codes) - len(self.totals)
+            self.totals = np.concatenate((self.totals, np.zeros(grow)))
+            self.counts = np.concatenate((self.counts, np.zeros(grow, dtype=np.int64)))
+        return pd.Series(actions).map(self.codes).fillna(-1).to_numpy(dtype=np.int64)
+
+    def update(self, events):
+        if len(events) == 0:
+            return self
+        times = np.asarray(events["time"], dtype=np.float64)
+        actions = np.asarray(events["action"], dtype=object)
+        codes = self._encode(actions)
+
+        known = codes >= 0
+        self.counts += np.bincount(codes[known], minlength=len(self.counts))
+        self.event_count += len(codes)
+
+        # Dwell times, the previous chunk's last event gets the gap to this one
+        if self.last_time is not None:
+            times_with_last = np.concatenate(([self.last_time], times))
+            codes_with_last = np.concatenate(([self.last_code], codes))
+        else:
+            times_with_last, codes_with_last = times, codes
+        dwell = np.diff(times_with_last)
+        dwell_codes = codes_with_last[:-1]
+        valid = dwell_codes >= 0
+        self.totals += np.bincount(dwell_codes[valid], weights=dwell[valid], minlength=len(self.totals))
+        self.last_time, self.last_code = times[-1], codes[-1]
+
+        # Burndown
+        allocate, remove = self.codes["Allocate"], self.codes["Remove"]
+        changes = (codes == allocate) | (codes == remove)
+        if changes.any():
+            deltas = np.where(codes[changes] == allocate, 1, -1)
+            running = self.remaining + np.cumsum(deltas)
+            self.series_times.append(times[changes])
+            self.series_remaining.append(running)
+            self.remaining = int(running[-1])
+
+        # Spreadsheet -> R latency: an R action pairs with the Spreadsheet action
+        # directly before it among the Spreadsheet/R actions
+        spreadsheet, r = self.codes["Spreadsheet"], self.codes["R"]
+        selected = (codes == spreadsheet) | (codes == r)
+        if selected.any():
+            step_times = times[selected]
+            is_spreadsheet = codes[selected] == spreadsheet
+            previous_time = np.concatenate((
+                [np.nan if self.pending_spreadsheet is None else self.pending_spreadsheet],
+                step_times[:-1]))
+            previous_spreadsheet = np.concatenate(([self.pending_spreadsheet is not None],
+                                                   is_spreadsheet[:-1]))
+            paired = ~is_spreadsheet & previous_spreadsheet
+            self.latencies.append(step_times[paired] - previous_time[paired])
+            self.latency_times.append(step_times[paired])
+            self.pending_spreadsheet = step_times[-1] if is_spreadsheet[-1] else None
+
+        missing = np.asarray(events["missing"], dtype=bool)
+        if missing.any():
+            self.missing_times.append(times[missing])
+        return self
+
+    def summary(self):
+        def join(parts, dtype=np.float64):
+            return np.concatenate(parts) if parts else np.array([], dtype=dtype)
+
+        actions = sorted(self.codes, key=self.codes.get)
+        return EventLogSummary(join(self.series_times), join(self.series_remaining, np.int64),
+                               dict(zip(actions, self.totals.tolist())),
+                               dict(zip(actions, self.counts.tolist())),
+                               join(self.latencies), join(self.latency_times),
+                               join(self.missing_times), self.event_count)
+
+
+def marker_event(time, action):
+    # One event chunk holding a single team-less event, e.g. a session start
+    return pd.DataFrame({"time": [float(time)], "action": [action], "team": [np.nan],
+                         "project": [np.nan], "missing": [False]})
+
+
+def analyse_events(chunks, start_event=None):
+    """Runs typed event chunks through ``EventLogAnalyzer`` and returns the summary.
+
+    ``start_event`` is an optional (time, action) pair processed before the
+    chunks, e.g. ``(0, "Allocate")`` for the session start marker used by
+    analysis.py.
+    """
+    analyzer = EventLogAnalyzer()
+    if start_event is not None:
+        analyzer.update(marker_event(*start_event))
+    for chunk in chunks:
+        analyzer.update(chunk)
+    return analyzer.summary()
+
+
+def analyse_event_log(path, chunksize=100000, start_event=None, sheet_name=None):
+    # Streams a log file chunk by chunk, see read_events and analyse_events
+    return analyse_events(read_events(path, chunksize, sheet_name), start_event)